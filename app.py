@@ -1,16 +1,34 @@
-from flask import Flask, request, render_template, jsonify
+from flask import Flask, request, render_template, jsonify, abort, Response
 import os
+import mimetypes
 from werkzeug.utils import secure_filename
 from medicine_extractor import MediScanExtractor
 import time
 from medicine_safety import MedicineSafetyChecker
+from result_cache import ResultCache
+from job_queue import ExtractionJobQueue, QueueFullError
+from preview_store import PreviewStore
+from frame_scanner import ScanSessionStore
+from metrics import metrics, peak_resident_bytes, resident_bytes
+import threading
 
 # Instantiate ONCE globally (so it loads the CSV just once)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 CSV_PATH = os.path.join(BASE_DIR, 'medicine_safety.csv')
+# Either the CSV or a compiled .msdb file (python medicine_safety.py build ...),
+# which is memory-mapped and shared between worker processes
+SAFETY_DB_PATH = os.environ.get('MEDISCAN_SAFETY_DB', CSV_PATH)
 
-print("Loading medicine safety DB from:", CSV_PATH)
-safety_checker = MedicineSafetyChecker(CSV_PATH)
+print("Loading medicine safety DB from:", SAFETY_DB_PATH)
+safety_checker = MedicineSafetyChecker(SAFETY_DB_PATH)
+
+# Pick up edits to the safety DB without a restart (seconds, 0 = off)
+SAFETY_DB_WATCH_INTERVAL = float(os.environ.get('MEDISCAN_SAFETY_DB_WATCH_INTERVAL', '0'))
+if SAFETY_DB_WATCH_INTERVAL > 0:
+    safety_checker.start_watching(SAFETY_DB_WATCH_INTERVAL)
+
+# Token for /api/admin/* (without it, admin endpoints only answer localhost)
+ADMIN_TOKEN = os.environ.get('MEDISCAN_ADMIN_TOKEN')
 
 app = Flask(__name__)
 
@@ -19,16 +37,203 @@ app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
 
+# Uploads are decoded straight from the request body. Set
+# MEDISCAN_PERSIST_UPLOADS=1 to also keep them in UPLOAD_FOLDER; otherwise
+# previews are served from a bounded in-memory store.
+app.config['PERSIST_UPLOADS'] = os.environ.get('MEDISCAN_PERSIST_UPLOADS', '0') == '1'
+app.config['PREVIEW_STORE_BYTES'] = int(os.environ.get('MEDISCAN_PREVIEW_STORE_MB', '64')) * 1024 * 1024
+if app.config['PERSIST_UPLOADS']:
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+# OCR cascade: stop running preprocessing variants once a confident match
+# (or a safety DB hit) is found. Enable with MEDISCAN_OCR_CASCADE=1.
+app.config['OCR_CASCADE'] = os.environ.get('MEDISCAN_OCR_CASCADE', '0') == '1'
+app.config['OCR_VARIANT_ORDER'] = [
+    v.strip() for v in os.environ.get('MEDISCAN_OCR_VARIANT_ORDER', '').split(',') if v.strip()
+] or None
+app.config['OCR_EARLY_EXIT_SCORE'] = float(os.environ.get('MEDISCAN_OCR_EARLY_EXIT_SCORE', '1.2'))
+# Run the text detector once per image and only re-run the recognizer per variant
+app.config['OCR_SHARED_DETECTION'] = os.environ.get('MEDISCAN_OCR_SHARED_DETECTION', '0') == '1'
+# OCR only the label area, and only its largest-text band for the costlier variants
+app.config['OCR_ROI'] = os.environ.get('MEDISCAN_OCR_ROI', '0') == '1'
+# Skew angle estimator: hough (default), min_area_rect or projection
+app.config['OCR_DESKEW_METHOD'] = os.environ.get('MEDISCAN_OCR_DESKEW_METHOD', 'hough')
+# Snap candidate names to known medicines: 'safety_db' (the safety DB's
+# names, following its reloads) or the path of a names file, one per line
+app.config['OCR_LEXICON'] = os.environ.get('MEDISCAN_OCR_LEXICON') or None
+# Batched extraction: crops per recognizer call and files per request
+app.config['OCR_BATCH_SIZE'] = int(os.environ.get('MEDISCAN_OCR_BATCH_SIZE', '16'))
+app.config['MAX_BATCH_FILES'] = int(os.environ.get('MEDISCAN_MAX_BATCH_FILES', '32'))
+# Most names per /api/safety/batch request
+app.config['SAFETY_BATCH_MAX_NAMES'] = int(os.environ.get('MEDISCAN_SAFETY_BATCH_MAX_NAMES', '1000'))
+# Parallel mode: variants OCR'd concurrently per request, with torch limited
+# to MEDISCAN_TORCH_THREADS intra-op threads (default cores // parallelism)
+app.config['OCR_PARALLELISM'] = int(os.environ.get('MEDISCAN_OCR_PARALLELISM', '1'))
+app.config['TORCH_THREADS'] = int(os.environ['MEDISCAN_TORCH_THREADS']) if os.environ.get('MEDISCAN_TORCH_THREADS') else None
+# Coalesce the text recognition of concurrent requests into shared batches:
+# wait up to MEDISCAN_OCR_BATCH_WAIT_MS (0 = off) for other requests' text
+# crops, at most MEDISCAN_OCR_BATCH_MAX_CROPS per recognizer batch
+app.config['OCR_BATCH_WAIT_MS'] = float(os.environ.get('MEDISCAN_OCR_BATCH_WAIT_MS', '0'))
+app.config['OCR_BATCH_MAX_CROPS'] = int(os.environ.get('MEDISCAN_OCR_BATCH_MAX_CROPS', '64'))
+# Inference backend of the OCR networks: torch (default), torch_fp32, onnx or
+# onnx_int8; ONNX models are exported once into MEDISCAN_ONNX_DIR
+app.config['OCR_BACKEND'] = os.environ.get('MEDISCAN_OCR_BACKEND', 'torch')
+app.config['ONNX_DIR'] = os.environ.get('MEDISCAN_ONNX_DIR')
+
+# Result cache for repeated uploads: in-memory LRU, plus an optional SQLite
+# tier shared across processes when MEDISCAN_RESULT_CACHE_DB is set
+app.config['RESULT_CACHE_SIZE'] = int(os.environ.get('MEDISCAN_RESULT_CACHE_SIZE', '256'))
+app.config['RESULT_CACHE_TTL'] = int(os.environ.get('MEDISCAN_RESULT_CACHE_TTL', '3600'))
+app.config['RESULT_CACHE_DB'] = os.environ.get('MEDISCAN_RESULT_CACHE_DB')
+app.config['RESULT_CACHE_DISK_MAX'] = int(os.environ.get('MEDISCAN_RESULT_CACHE_DISK_MAX', '10000'))
+
+# Async job mode (/api/jobs): worker processes, each with its own extractor.
+# 0 workers disables it.
+app.config['ASYNC_WORKERS'] = int(os.environ.get('MEDISCAN_ASYNC_WORKERS', '0'))
+app.config['ASYNC_MAX_PENDING'] = int(os.environ.get('MEDISCAN_ASYNC_MAX_PENDING', '32'))
+app.config['ASYNC_MAX_WAIT'] = 30  # longest long-poll, seconds
+
+# Webcam scanning sessions (/api/scan/sessions): frames sharper than
+# MEDISCAN_SCAN_MIN_SHARPNESS and not near-duplicates are OCR'd until the
+# fused result is stable. Sessions live in one process, so multi-worker
+# deployments need sticky routing for them.
+app.config['SCAN_MAX_SESSIONS'] = int(os.environ.get('MEDISCAN_SCAN_MAX_SESSIONS', '64'))
+app.config['SCAN_SESSION_TTL'] = int(os.environ.get('MEDISCAN_SCAN_SESSION_TTL', '300'))
+app.config['SCAN_MIN_SHARPNESS'] = float(os.environ.get('MEDISCAN_SCAN_MIN_SHARPNESS', '40'))
+app.config['SCAN_STABLE_FRAMES'] = int(os.environ.get('MEDISCAN_SCAN_STABLE_FRAMES', '3'))
+app.config['SCAN_MAX_OCR_FRAMES'] = int(os.environ.get('MEDISCAN_SCAN_MAX_OCR_FRAMES', '12'))
+
+# The OCR model loads lazily so importing the app (and answering /,
+# /api/health or safety lookups) doesn't wait for torch. By default it is
+# loaded and warmed up in a background thread at startup
+# (MEDISCAN_WARMUP=0: on the first request instead). MEDISCAN_PRELOAD_MODEL=1
+# loads the weights during import, for preload-and-fork servers
+# (see gunicorn.conf.py) whose workers then share them copy-on-write.
+app.config['WARMUP'] = os.environ.get('MEDISCAN_WARMUP', '1') == '1'
+app.config['PRELOAD_MODEL'] = os.environ.get('MEDISCAN_PRELOAD_MODEL', '0') == '1'
+
+preview_store = PreviewStore(max_bytes=app.config['PREVIEW_STORE_BYTES'])
+
+result_cache = ResultCache(
+    max_entries=app.config['RESULT_CACHE_SIZE'],
+    ttl=app.config['RESULT_CACHE_TTL'],
+    disk_path=app.config['RESULT_CACHE_DB'],
+    disk_max_entries=app.config['RESULT_CACHE_DISK_MAX']
+)
+
 # Initialize extractor (load model once)
 print("=" * 60)
 print("🏥 MediScan - AI Medicine Name Extractor")
 print("=" * 60)
-extractor = MediScanExtractor()
+extractor = MediScanExtractor(
+    cascade=app.config['OCR_CASCADE'],
+    variant_order=app.config['OCR_VARIANT_ORDER'],
+    early_exit_score=app.config['OCR_EARLY_EXIT_SCORE'],
+    safety_checker=safety_checker,
+    shared_detection=app.config['OCR_SHARED_DETECTION'],
+    roi=app.config['OCR_ROI'],
+    deskew_method=app.config['OCR_DESKEW_METHOD'],
+    lexicon=app.config['OCR_LEXICON'],
+    batch_size=app.config['OCR_BATCH_SIZE'],
+    parallelism=app.config['OCR_PARALLELISM'],
+    torch_threads=app.config['TORCH_THREADS'],
+    batch_wait_ms=app.config['OCR_BATCH_WAIT_MS'],
+    batch_max_crops=app.config['OCR_BATCH_MAX_CROPS'],
+    lazy=True,
+    backend=app.config['OCR_BACKEND'],
+    onnx_dir=app.config['ONNX_DIR']
+)
 print("=" * 60)
 
+scan_sessions = ScanSessionStore(
+    extractor,
+    max_sessions=app.config['SCAN_MAX_SESSIONS'],
+    ttl=app.config['SCAN_SESSION_TTL'],
+    min_sharpness=app.config['SCAN_MIN_SHARPNESS'],
+    stable_frames=app.config['SCAN_STABLE_FRAMES'],
+    max_ocr_frames=app.config['SCAN_MAX_OCR_FRAMES']
+)
+
+warmup_thread = None
+warmup_lock = threading.Lock()
+
+def start_warmup():
+    """Load and warm up the model in the background (once per process)"""
+    global warmup_thread
+    with warmup_lock:
+        if warmup_thread is None:
+            warmup_thread = threading.Thread(target=extractor.warmup, name='model-warmup', daemon=True)
+            warmup_thread.start()
+
+# Spawned job-queue workers re-import this file as __mp_main__; they load their own model
+if __name__ != '__mp_main__':
+    if app.config['PRELOAD_MODEL']:
+        # Weights only: running inference before fork can leave the forked
+        # workers with a broken torch thread pool, so they warm up after fork
+        extractor.load_model()
+    elif app.config['WARMUP']:
+        start_warmup()
+
+job_queue = None
+job_queue_lock = threading.Lock()
+
+def get_job_queue():
+    """Start the worker pool on first use (not at import, so spawned workers don't recurse)"""
+    global job_queue
+    with job_queue_lock:
+        if job_queue is None:
+            job_queue = ExtractionJobQueue(
+                num_workers=app.config['ASYNC_WORKERS'],
+                max_pending=app.config['ASYNC_MAX_PENDING'],
+                extractor_kwargs=extractor.init_kwargs(),
+                safety_db_path=SAFETY_DB_PATH
+            )
+        return job_queue
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def require_admin():
+    """Abort with 403 unless the request is allowed to use admin endpoints"""
+    if ADMIN_TOKEN:
+        if request.headers.get('X-Admin-Token') != ADMIN_TOKEN:
+            abort(403)
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        abort(403)
+
+def store_upload(data, original_filename):
+    """Keep an upload for the preview and return its URL"""
+    if app.config['PERSIST_UPLOADS']:
+        filename = secure_filename(original_filename)
+        timestamp = str(int(time.time()))
+        filename = f"{timestamp}_{filename}"
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        with open(filepath, 'wb') as f:
+            f.write(data)
+        return f"/static/uploads/{filename}"
+
+    mimetype = mimetypes.guess_type(original_filename)[0] or 'application/octet-stream'
+    return f"/api/preview/{preview_store.put(data, mimetype)}"
+
+def debug_requested():
+    """?debug=1 adds per-stage timings (ms) to extraction responses"""
+    return request.args.get('debug') == '1'
+
+def record_request(endpoint, outcome, started):
+    metrics.inc('mediscan_requests_total', endpoint=endpoint, outcome=outcome)
+    metrics.observe('mediscan_request_duration_seconds', time.perf_counter() - started, endpoint=endpoint)
+
+def attach_safety(result):
+    """Run the safety check on the best match of an extraction result (cached, cheap to repeat)"""
+    if result.get('success') and result.get('best_match'):
+        extracted_name = result['best_match']['name']
+        safety_result = safety_checker.check_safety(extracted_name)
+    else:
+        safety_result = {'found': False, 'message': "No medicine name recognized, safety check skipped."}
+
+    result['safety'] = safety_result
+    return result
+
 @app.route('/')
 def index():
     """Render main page"""
@@ -47,28 +252,41 @@ def extract_medicine():
     if not allowed_file(file.filename):
         return jsonify({'success': False, 'error': 'Invalid file type.  Please upload an image.'}), 400
 
+    started = time.perf_counter()
     try:
-        filename = secure_filename(file.filename)
-        timestamp = str(int(time.time()))
-        filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        with metrics.request_timings() as timings:
+            data = file.read()
 
-        print(f"\n📥 New image uploaded: {filename}")
+            # Same image + same pipeline config -> reuse the earlier result
+            cache_key = result_cache.make_key(data, extractor.config_fingerprint())
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                print(f"\n⚡ Cache hit for {file.filename}")
+                if not app.config['PERSIST_UPLOADS']:
+                    # The in-memory preview may have been evicted since
+                    cached['image_url'] = store_upload(data, file.filename)
+                attach_safety(cached)
+                if debug_requested():
+                    cached['timings'] = timings
+                record_request('extract', 'cached', started)
+                return jsonify(cached)
 
-        # Process image to extract medicine name etc
-        result = extractor.process_image(filepath)
+            print(f"\n📥 New image uploaded: {file.filename} ({len(data)} bytes)")
 
-        # ------ SAFETY CHECK ------
-        if result.get('success') and result.get('best_match'):
-            extracted_name = result['best_match']['name']
-            safety_result = safety_checker.check_safety(extracted_name)
-        else:
-            safety_result = {'found': False, 'message': "No medicine name recognized, safety check skipped."}
+            # Process image to extract medicine name etc (decoded from memory)
+            result = extractor.process_image(data)
+            # Include image for preview if you want
+            result['image_url'] = store_upload(data, file.filename)
+            if result['success']:
+                result_cache.put(cache_key, result)
+
+            # ------ SAFETY CHECK ------
+            # Not cached, so results follow the current safety DB
+            attach_safety(result)
 
-        result['safety'] = safety_result
-        # Include image for preview if you want
-        result['image_url'] = f"/static/uploads/{filename}"
+        if debug_requested():
+            result['timings'] = timings
+        record_request('extract', 'success' if result['success'] else 'failure', started)
 
         if result['success']:
             print(f"✅ Processing complete!")
@@ -81,17 +299,315 @@ def extract_medicine():
 
     except Exception as e:
         print(f"❌ Server Error: {str(e)}")
+        record_request('extract', 'error', started)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+def sse_event(kind, payload):
+    """Format one Server-Sent Event"""
+    return f"event: {kind}\ndata: {app.json.dumps(payload)}\n\n"
+
+@app.route('/api/extract/stream', methods=['POST'])
+def extract_medicine_stream():
+    """Extraction as Server-Sent Events: a provisional result after every OCR pass, then the final one"""
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'error': 'No file provided'}), 400
+
+    file = request.files['file']
+
+    if file.filename == '':
+        return jsonify({'success': False, 'error': 'No file selected'}), 400
+
+    if not allowed_file(file.filename):
+        return jsonify({'success': False, 'error': 'Invalid file type.  Please upload an image.'}), 400
+
+    # Everything from the request is read here; the generator runs after the view returns
+    data = file.read()
+    filename = file.filename
+    started = time.perf_counter()
+    cache_key = result_cache.make_key(data, extractor.config_fingerprint())
+    cached = result_cache.get(cache_key)
+    # As in /api/extract, a persisted upload is only written on a miss
+    if cached is None:
+        image_url = store_upload(data, filename)
+    elif not app.config['PERSIST_UPLOADS']:
+        cached['image_url'] = store_upload(data, filename)
+
+    def events():
+        if cached is not None:
+            print(f"\n⚡ Cache hit for {filename}")
+            record_request('stream', 'cached', started)
+            yield sse_event('result', attach_safety(cached))
+            return
+
+        print(f"\n📥 New image uploaded for streaming: {filename} ({len(data)} bytes)")
+        metrics.add_gauge('mediscan_requests_in_flight', 1)
+        try:
+            for kind, result in extractor.stream_image(data):
+                result['image_url'] = image_url
+                if kind == 'result':
+                    if result['success']:
+                        result_cache.put(cache_key, result)
+                    record_request('stream', 'success' if result['success'] else 'failure', started)
+                yield sse_event(kind, attach_safety(result))
+        finally:
+            metrics.add_gauge('mediscan_requests_in_flight', -1)
+
+    return Response(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # don't let a reverse proxy buffer the stream
+    })
+
+@app.route('/api/jobs', methods=['POST'])
+def submit_extraction_job():
+    """Queue an image for extraction and return a job id immediately"""
+    if app.config['ASYNC_WORKERS'] <= 0:
+        return jsonify({'success': False, 'error': 'Async job mode is disabled'}), 404
+
+    if 'file' not in request.files:
+        return jsonify({'success': False, 'error': 'No file provided'}), 400
+
+    file = request.files['file']
+
+    if file.filename == '':
+        return jsonify({'success': False, 'error': 'No file selected'}), 400
+
+    if not allowed_file(file.filename):
+        return jsonify({'success': False, 'error': 'Invalid file type.  Please upload an image.'}), 400
+
+    try:
+        data = file.read()
+        meta = {}
+        job_id = get_job_queue().submit(data, meta=meta)
+        meta['image_url'] = store_upload(data, file.filename)
+    except QueueFullError as e:
+        response = jsonify({'success': False, 'error': str(e)})
+        response.headers['Retry-After'] = '1'
+        return response, 429
+    except Exception as e:
+        print(f"❌ Server Error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    print(f"\n📥 Job {job_id} queued: {file.filename}")
+    return jsonify({'success': True, 'job_id': job_id, 'status_url': f"/api/jobs/{job_id}"}), 202
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_extraction_job(job_id):
+    """Job status; ?wait=<seconds> long-polls until the job finishes"""
+    if job_queue is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+
+    wait = min(request.args.get('wait', 0, type=float), app.config['ASYNC_MAX_WAIT'])
+    job = job_queue.get(job_id, wait=wait)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Unknown job'}), 404
+
+    result = job.pop('result')
+    meta = job.pop('meta')
+    if result is not None:
+        result['image_url'] = meta.get('image_url')
+        job['result'] = attach_safety(result)
+    return jsonify(job)
+
+@app.route('/api/jobs', methods=['GET'])
+def job_queue_stats():
+    """Queue depth, backpressure and timing counters of the async job mode"""
+    if app.config['ASYNC_WORKERS'] <= 0:
+        return jsonify({'enabled': False})
+    return jsonify({'enabled': True, **get_job_queue().stats()})
+
+@app.route('/api/extract/batch', methods=['POST'])
+def extract_medicine_batch():
+    """Extract medicine names from many uploaded images in one batched pass"""
+    files = [f for f in request.files.getlist('files') if f.filename != '']
+
+    if not files:
+        return jsonify({'success': False, 'error': 'No files provided'}), 400
+
+    if len(files) > app.config['MAX_BATCH_FILES']:
+        return jsonify({'success': False, 'error': f"Too many files (max {app.config['MAX_BATCH_FILES']})"}), 400
+
+    started = time.perf_counter()
+    try:
+        with metrics.request_timings() as timings:
+            results = [None] * len(files)
+            saved = []
+            config = extractor.config_fingerprint()
+            for idx, file in enumerate(files):
+                if not allowed_file(file.filename):
+                    results[idx] = {'success': False, 'error': 'Invalid file type.  Please upload an image.'}
+                    continue
+                data = file.read()
+                cache_key = result_cache.make_key(data, config)
+                cached = result_cache.get(cache_key)
+                if cached is not None:
+                    if not app.config['PERSIST_UPLOADS']:
+                        cached['image_url'] = store_upload(data, file.filename)
+                    results[idx] = attach_safety(cached)
+                    continue
+                saved.append((idx, data, cache_key))
+
+            print(f"\n📥 New batch uploaded: {len(saved)} images ({len(files) - len(saved)} cached or rejected)")
+
+            batch_results = extractor.process_images([data for _, data, _ in saved]) if saved else []
+            for (idx, data, cache_key), result in zip(saved, batch_results):
+                result['image_url'] = store_upload(data, files[idx].filename)
+                if result['success']:
+                    result_cache.put(cache_key, result)
+                attach_safety(result)
+                results[idx] = result
+
+        for file, result in zip(files, results):
+            result['filename'] = file.filename
+
+        response = {'success': True, 'count': len(results), 'results': results}
+        if debug_requested():
+            # Stages of a batch are shared between its images
+            response['timings'] = timings
+        record_request('batch', 'success', started)
+        return jsonify(response)
+
+    except Exception as e:
+        print(f"❌ Server Error: {str(e)}")
+        record_request('batch', 'error', started)
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/safety/batch', methods=['POST'])
+def check_safety_batch():
+    """Safety check of a list of medicine names ({"names": [...]}) with their aggregate risk"""
+    payload = request.get_json(silent=True) or {}
+    names = payload.get('names')
+    if not isinstance(names, list) or not names or not all(isinstance(name, str) for name in names):
+        return jsonify({'success': False, 'error': 'Expected JSON {"names": [...]} with medicine names'}), 400
+
+    if len(names) > app.config['SAFETY_BATCH_MAX_NAMES']:
+        return jsonify({'success': False, 'error': f"Too many names (max {app.config['SAFETY_BATCH_MAX_NAMES']})"}), 400
+
+    started = time.perf_counter()
+    try:
+        response = {'success': True, **safety_checker.check_safety_batch(names)}
+        record_request('safety_batch', 'success', started)
+        return jsonify(response)
+
+    except Exception as e:
+        print(f"❌ Server Error: {str(e)}")
+        record_request('safety_batch', 'error', started)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/scan/sessions', methods=['POST'])
+def create_scan_session():
+    """Start a webcam scanning session; frames are then posted to its frames_url"""
+    session_id = scan_sessions.create()
+    return jsonify({'success': True, 'session_id': session_id,
+                    'frames_url': f"/api/scan/sessions/{session_id}/frames"}), 201
+
+@app.route('/api/scan/sessions/<session_id>/frames', methods=['POST'])
+def add_scan_frames(session_id):
+    """Feed one or more frames ('frames' files, or one encoded image as the body); returns the fused result"""
+    scanner = scan_sessions.get(session_id)
+    if scanner is None:
+        return jsonify({'success': False, 'error': 'Unknown scan session'}), 404
+
+    frames = [f.read() for f in request.files.getlist('frames') if f.filename != '']
+    if not frames and not request.files and request.content_length:
+        frames = [request.get_data()]
+    if not frames:
+        return jsonify({'success': False, 'error': 'No frames provided'}), 400
+
+    started = time.perf_counter()
+    try:
+        with metrics.request_timings() as timings:
+            for data in frames:
+                state = scanner.add_frame(data)
+            attach_safety(state)
+        if debug_requested():
+            state['timings'] = timings
+        record_request('scan', 'success', started)
+        return jsonify(state)
+
+    except Exception as e:
+        print(f"❌ Server Error: {str(e)}")
+        record_request('scan', 'error', started)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/scan/sessions/<session_id>', methods=['DELETE'])
+def close_scan_session(session_id):
+    """End a scanning session and return its final fused result"""
+    scanner = scan_sessions.close(session_id)
+    if scanner is None:
+        return jsonify({'success': False, 'error': 'Unknown scan session'}), 404
+    return jsonify(attach_safety(scanner.result()))
+
+@app.route('/api/preview/<preview_id>', methods=['GET'])
+def get_preview(preview_id):
+    """Serve an upload kept in the in-memory preview store"""
+    item = preview_store.get(preview_id)
+    if item is None:
+        return jsonify({'success': False, 'error': 'Preview expired'}), 404
+    data, mimetype = item
+    return Response(data, mimetype=mimetype, headers={'Cache-Control': 'private, max-age=3600'})
+
+@app.route('/api/admin/reload-safety', methods=['POST'])
+def reload_safety_db():
+    """Reload the safety DB from disk and swap it in atomically"""
+    require_admin()
+    try:
+        return jsonify({'success': True, 'safety_db': safety_checker.reload()})
+    except Exception as e:
+        print(f"❌ Safety DB reload failed: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Stage latency histograms and counters in the Prometheus text format"""
+    cache = result_cache.stats()
+    metrics.set_gauge('mediscan_result_cache_hits', cache['hits'])
+    metrics.set_gauge('mediscan_result_cache_misses', cache['misses'])
+    metrics.set_gauge('mediscan_safety_db_medicines', safety_checker.info()['medicines'])
+    metrics.set_gauge('mediscan_preview_store_bytes', preview_store.stats()['bytes'])
+    metrics.set_gauge('mediscan_scan_sessions_open', len(scan_sessions))
+    # With mediscan_requests_in_flight and mediscan_preprocess_peak_bytes
+    # these give the memory per in-flight request, for sizing workers
+    for name, value in (('mediscan_process_resident_bytes', resident_bytes()),
+                        ('mediscan_process_peak_resident_bytes', peak_resident_bytes())):
+        if value is not None:
+            metrics.set_gauge(name, value)
+    if job_queue is not None:
+        jobs = job_queue.stats()
+        metrics.set_gauge('mediscan_jobs_queued', jobs['queued'])
+        metrics.set_gauge('mediscan_jobs_running', jobs['running'])
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/health/live', methods=['GET'])
+def liveness_check():
+    """Liveness: the process is up and serving (the model may still be loading)"""
+    return jsonify({'status': 'alive'})
+
+@app.route('/api/health/ready', methods=['GET'])
+def readiness_check():
+    """Readiness: 200 once the model is loaded and warmed up, 503 before"""
+    ready = extractor.is_ready
+    return jsonify({'ready': ready, 'model': extractor.model_state()}), 200 if ready else 503
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'model':  'loaded'})
+    return jsonify({
+        'status': 'healthy',
+        'ready': extractor.is_ready,
+        'model': extractor.model_state(),
+        'result_cache': result_cache.stats(),
+        'safety_db': safety_checker.info(),
+        'jobs': job_queue.stats() if job_queue is not None else None,
+        'preview_store': preview_store.stats()
+    })
 
 if __name__ == '__main__':
     # Create upload folder if it doesn't exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
+    if app.config['PRELOAD_MODEL'] and app.config['WARMUP']:
+        start_warmup()
+    
     print("\n🌐 Starting web server...")
     print("📱 Open your browser and go to: http://localhost:8080")
     print("=" * 60 + "\n")
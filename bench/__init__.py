@@ -0,0 +1,23 @@
+"""Benchmarks for the extraction pipeline and the safety DB
+
+Run from the repository root:
+
+    python -m bench.pipeline --count 50 --out pipeline.json
+    python -m bench.safety --out safety.json
+"""
+import numpy as np
+
+
+def percentiles(values):
+    """Summary statistics of a list of latencies"""
+    if not values:
+        return {}
+    values = np.asarray(values, dtype=float)
+    return {
+        'mean': round(float(values.mean()), 2),
+        'p50': round(float(np.percentile(values, 50)), 2),
+        'p90': round(float(np.percentile(values, 90)), 2),
+        'p95': round(float(np.percentile(values, 95)), 2),
+        'p99': round(float(np.percentile(values, 99)), 2),
+        'max': round(float(values.max()), 2),
+    }
@@ -0,0 +1,216 @@
+"""End-to-end benchmark of MediScanExtractor on synthetic medicine packs
+
+    python -m bench.pipeline --count 50 --out pipeline.json
+    python -m bench.pipeline --count 50 --cascade --compare pipeline.json
+    python -m bench.pipeline --count 50 --backend onnx_int8 --compare pipeline.json
+    python -m bench.pipeline --count 50 --cascade --lexicon safety_db --compare pipeline.json
+    python -m bench.pipeline --count 50 --concurrency 8 --batch-wait-ms 10 --compare pipeline.json
+
+Measures process_image latency percentiles and throughput, the per-stage
+cost (decode, deskew, each preprocessing variant, each OCR pass, ...) and
+top-1 accuracy against the rendered ground truth, and writes a JSON report.
+Comparing runs of different --backend settings gives their accuracy delta.
+With --concurrency N the images are processed by N threads sharing the
+extractor, like concurrent requests to the app.
+"""
+import argparse
+import json
+import os
+import platform
+import time
+import torch
+from concurrent.futures import ThreadPoolExecutor
+
+from bench import percentiles
+from bench.synthetic import generate_dataset
+from medicine_extractor import MediScanExtractor
+from medicine_safety import MedicineSafetyChecker, normalize_name
+from metrics import metrics, peak_resident_bytes
+from ocr_backend import BACKENDS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def score_sample(sample, result, safety_checker):
+    """Accuracy fields of one result against the rendered name"""
+    truth = normalize_name(sample['name'])
+    candidates = [normalize_name(c['name']) for c in result.get('all_candidates', [])]
+    best = candidates[0] if candidates else None
+    record = {
+        'top1': best == truth,
+        'top5': truth in candidates[:5],
+        # Whether the safety lookup of the best match lands on the right row,
+        # which is what the app actually reports
+        'top1_safety': False,
+    }
+    if best is not None and safety_checker is not None:
+        safety = safety_checker.check_safety(result['best_match']['name'])
+        record['top1_safety'] = safety.get('found', False) and normalize_name(safety['medicine_name']) == truth
+    return record
+
+
+def run(extractor, samples, safety_checker, warmup=1, concurrency=1):
+    for sample in samples[:warmup]:
+        extractor.process_image(sample['png'])
+
+    def process(sample):
+        with metrics.request_timings() as timings:
+            t0 = time.perf_counter()
+            result = extractor.process_image(sample['png'])
+            latency_ms = (time.perf_counter() - t0) * 1000
+        return sample, result, latency_ms, timings
+
+    per_image = []
+    stage_totals = {}
+    pixels_before = metrics.total('mediscan_ocr_pixels_total')
+    passes_before = metrics.total('mediscan_variants_run_total')
+    peak_before = metrics.histogram_totals('mediscan_preprocess_peak_bytes')
+    started = time.perf_counter()
+    pool = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+    processed = pool.map(process, samples) if pool is not None else map(process, samples)
+    for sample, result, latency_ms, timings in processed:
+        for stage, ms in timings.items():
+            total = stage_totals.setdefault(stage, {'total_ms': 0.0, 'images': 0})
+            total['total_ms'] += ms
+            total['images'] += 1
+
+        record = {
+            'id': sample['id'],
+            'truth': sample['name'],
+            'predicted': result['best_match']['name'] if result.get('success') else None,
+            'success': bool(result.get('success')),
+            'latency_ms': round(latency_ms, 2),
+            'variants_run': result.get('variants_run', []),
+            **score_sample(sample, result, safety_checker),
+        }
+        per_image.append(record)
+        print(f"  {record['id']} {record['truth']!r} -> {record['predicted']!r} "
+              f"({record['latency_ms']:.0f} ms){'' if record['top1'] else '  ✗'}")
+    elapsed = time.perf_counter() - started
+    if pool is not None:
+        pool.shutdown()
+    passes = metrics.total('mediscan_variants_run_total') - passes_before
+    pixels = metrics.total('mediscan_ocr_pixels_total') - pixels_before
+    peak_sum, peak_count = (after - before for after, before in
+                            zip(metrics.histogram_totals('mediscan_preprocess_peak_bytes'), peak_before))
+
+    n = len(per_image)
+    per_stage = {
+        stage: {
+            'total_ms': round(total['total_ms'], 2),
+            'mean_ms_per_image': round(total['total_ms'] / n, 2),
+            'share': round(total['total_ms'] / (elapsed * 1000), 4),
+        }
+        for stage, total in sorted(stage_totals.items(), key=lambda item: -item[1]['total_ms'])
+    }
+    variant_counts = {}
+    for record in per_image:
+        for strategy in record['variants_run']:
+            variant_counts[strategy] = variant_counts.get(strategy, 0) + 1
+
+    return {
+        'summary': {
+            'images': n,
+            'elapsed_s': round(elapsed, 3),
+            'throughput_ips': round(n / elapsed, 3) if elapsed else None,
+            'latency_ms': percentiles([r['latency_ms'] for r in per_image]),
+            'success_rate': round(sum(r['success'] for r in per_image) / n, 4) if n else None,
+            'top1_accuracy': round(sum(r['top1'] for r in per_image) / n, 4) if n else None,
+            'top5_accuracy': round(sum(r['top5'] for r in per_image) / n, 4) if n else None,
+            'top1_safety_accuracy': round(sum(r['top1_safety'] for r in per_image) / n, 4) if n else None,
+            'mean_variants_run': round(sum(len(r['variants_run']) for r in per_image) / n, 2) if n else None,
+            'mean_pixels_per_pass': round(pixels / passes) if passes else None,
+            'mean_preprocess_peak_mb': round(peak_sum / peak_count / 2 ** 20, 2) if peak_count else None,
+        },
+        'per_stage': per_stage,
+        'variants_run': variant_counts,
+        'images': per_image,
+    }
+
+
+def compare(report, baseline):
+    """Print summary deltas against an earlier report"""
+    print(f"\n📊 Compared with {baseline['config']}")
+    for key in ('throughput_ips', 'top1_accuracy', 'top5_accuracy', 'top1_safety_accuracy', 'mean_variants_run',
+                'mean_pixels_per_pass', 'mean_preprocess_peak_mb', 'max_rss_mb'):
+        new, old = report['summary'].get(key), baseline['summary'].get(key)
+        if new is not None and old is not None:
+            print(f"  {key:22s} {old:>10} -> {new:>10} ({new - old:+.4f})")
+    for key in ('p50', 'p95'):
+        new, old = report['summary']['latency_ms'].get(key), baseline['summary']['latency_ms'].get(key)
+        if new is not None and old is not None:
+            print(f"  latency {key:14s} {old:>10} -> {new:>10} ({(new - old) / old:+.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the extraction pipeline on synthetic packs")
+    parser.add_argument('--csv', default=os.path.join(BASE_DIR, 'medicine_safety.csv'))
+    parser.add_argument('--count', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--images-dir', help="Also write the rendered images and manifest here")
+    parser.add_argument('--out', default='bench_pipeline.json')
+    parser.add_argument('--compare', help="Earlier report to print deltas against")
+    parser.add_argument('--cascade', action='store_true')
+    parser.add_argument('--shared-detection', action='store_true')
+    parser.add_argument('--roi', action='store_true')
+    parser.add_argument('--deskew-method', choices=MediScanExtractor.DESKEW_METHODS, default='hough')
+    parser.add_argument('--lexicon', help="'safety_db' or a names file to snap candidates to")
+    parser.add_argument('--parallelism', type=int, default=1)
+    parser.add_argument('--torch-threads', type=int)
+    parser.add_argument('--concurrency', type=int, default=1, help="Threads processing images at once")
+    parser.add_argument('--batch-wait-ms', type=float, default=0.0,
+                        help="Coalesce the threads' text recognition, waiting up to this long (0 = off)")
+    parser.add_argument('--batch-max-crops', type=int, default=64)
+    parser.add_argument('--backend', choices=BACKENDS, default='torch')
+    parser.add_argument('--onnx-dir')
+    args = parser.parse_args()
+
+    print(f"🧪 Rendering {args.count} synthetic packs (seed {args.seed})...")
+    samples = generate_dataset(args.csv, args.count, seed=args.seed, out_dir=args.images_dir)
+
+    safety_checker = MedicineSafetyChecker(args.csv)
+    config = {
+        'cascade': args.cascade,
+        'shared_detection': args.shared_detection,
+        'roi': args.roi,
+        'deskew_method': args.deskew_method,
+        'lexicon': args.lexicon,
+        'parallelism': args.parallelism,
+        'torch_threads': args.torch_threads,
+        'batch_wait_ms': args.batch_wait_ms,
+        'batch_max_crops': args.batch_max_crops,
+        'backend': args.backend,
+    }
+    extractor = MediScanExtractor(safety_checker=safety_checker, onnx_dir=args.onnx_dir, **config)
+
+    report = run(extractor, samples, safety_checker, warmup=args.warmup, concurrency=args.concurrency)
+    # Peak resident memory of this process (model weights + working buffers)
+    peak = peak_resident_bytes()
+    report['summary']['max_rss_mb'] = round(peak / 2 ** 20, 1) if peak is not None else None
+    report['config'] = {**config, 'concurrency': args.concurrency, 'count': args.count, 'seed': args.seed, 'csv': os.path.basename(args.csv)}
+    report['environment'] = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    summary = report['summary']
+    print(f"\n✅ {summary['images']} images in {summary['elapsed_s']}s "
+          f"({summary['throughput_ips']} img/s), p50 {summary['latency_ms'].get('p50')} ms, "
+          f"p95 {summary['latency_ms'].get('p95')} ms, top-1 {summary['top1_accuracy']}")
+    print(f"📝 Report written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Micro-benchmark of MedicineSafetyChecker.check_safety
+
+    python -m bench.safety --sizes 50 10000 500000 --out safety.json
+
+For each DB size a synthetic compiled DB is built (the real CSV rows padded
+with generated names), then exact, fuzzy (one-character OCR typo) and miss
+lookups are timed with the lookup cache disabled, and so is one
+check_safety_batch call over all of those queries (reported per name).
+"""
+import argparse
+import json
+import os
+import string
+import tempfile
+import time
+import numpy as np
+
+from bench import percentiles
+from medicine_safety import MedicineSafetyChecker, compile_rows, read_csv_rows, normalize_name
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SYLLABLES = [
+    'ab', 'ac', 'al', 'am', 'an', 'ar', 'az', 'ba', 'ce', 'ci', 'cla', 'co', 'da', 'de', 'dol',
+    'dro', 'fen', 'fil', 'ga', 'ine', 'ix', 'lo', 'lol', 'mab', 'max', 'me', 'min', 'mol', 'mox',
+    'na', 'nib', 'nol', 'o', 'pam', 'pen', 'pra', 'pril', 'ra', 're', 'ro', 'sar', 'ta', 'tan',
+    'ter', 'ti', 'tin', 'to', 'tra', 'va', 'vir', 'xa', 'zo', 'zol', 'zep',
+]
+
+
+def synthetic_rows(base_rows, size, rng):
+    """`size` rows: the CSV rows first, then generated drug-like names"""
+    rows = list(base_rows[:size])
+    seen = {normalize_name(row['medicine_name']) for row in rows}
+    template = base_rows[0]
+    while len(rows) < size:
+        parts = rng.choice(SYLLABLES, size=int(rng.integers(2, 5)))
+        name = ''.join(parts).capitalize()
+        if rng.random() < 0.3:
+            name += f"-{int(rng.integers(5, 1000))}"
+        if normalize_name(name) in seen:
+            continue
+        seen.add(normalize_name(name))
+        rows.append({**template, 'medicine_name': name, 'ingredients': name})
+    return rows
+
+
+def typo(name, rng):
+    """Substitute one letter, like a misread OCR character"""
+    positions = [i for i, c in enumerate(name) if c.isalpha()]
+    pos = int(rng.choice(positions))
+    replacement = rng.choice([c for c in string.ascii_lowercase if c != name[pos].lower()])
+    return name[:pos] + str(replacement) + name[pos + 1:]
+
+
+def time_lookups(checker, queries):
+    latencies = []
+    results = []
+    for query in queries:
+        t0 = time.perf_counter()
+        results.append(checker.check_safety(query))
+        latencies.append((time.perf_counter() - t0) * 1e6)
+    return latencies, results
+
+
+def bench_size(base_rows, size, queries, rng, tmp_dir):
+    rows = synthetic_rows(base_rows, size, rng)
+
+    t0 = time.perf_counter()
+    image = compile_rows(rows)
+    compile_s = time.perf_counter() - t0
+    path = os.path.join(tmp_dir, f"bench_{size}.msdb")
+    with open(path, 'wb') as f:
+        f.write(image)
+
+    t0 = time.perf_counter()
+    # cache_size=0: every lookup does the full exact / fuzzy search
+    checker = MedicineSafetyChecker(path, cache_size=0)
+    open_ms = (time.perf_counter() - t0) * 1000
+
+    names = [row['medicine_name'] for row in rows]
+    picks = [names[int(i)] for i in rng.integers(0, len(names), size=queries)]
+    exact_queries = [name.upper() if rng.random() < 0.5 else name for name in picks]
+    fuzzy_sources = [name for name in picks if sum(c.isalpha() for c in name) >= 6] or picks
+    fuzzy_queries = [(source, typo(source, rng)) for source in fuzzy_sources]
+    miss_queries = [''.join(rng.choice(list('qxzjkvw'), size=8)) for _ in range(queries)]
+
+    exact_us, exact_results = time_lookups(checker, exact_queries)
+    fuzzy_us, fuzzy_results = time_lookups(checker, [query for _, query in fuzzy_queries])
+    miss_us, miss_results = time_lookups(checker, miss_queries)
+
+    batch = exact_queries + [query for _, query in fuzzy_queries] + miss_queries
+    t0 = time.perf_counter()
+    checker.check_safety_batch(batch)
+    batch_us_per_name = (time.perf_counter() - t0) * 1e6 / len(batch)
+
+    fuzzy_correct = sum(
+        result.get('found', False) and normalize_name(result['medicine_name']) == normalize_name(source)
+        for (source, _), result in zip(fuzzy_queries, fuzzy_results)
+    )
+    report = {
+        'rows': len(checker.table),
+        'file_bytes': len(image),
+        'compile_s': round(compile_s, 3),
+        'open_ms': round(open_ms, 3),
+        'exact_us': percentiles(exact_us),
+        'exact_found_rate': round(sum(r.get('found', False) for r in exact_results) / len(exact_results), 4),
+        'fuzzy_us': percentiles(fuzzy_us),
+        'fuzzy_recall': round(fuzzy_correct / len(fuzzy_queries), 4),
+        'miss_us': percentiles(miss_us),
+        'miss_false_positive_rate': round(sum(r.get('found', False) for r in miss_results) / len(miss_results), 4),
+        'batch_names': len(batch),
+        'batch_us_per_name': round(batch_us_per_name, 2),
+    }
+    # The mapping goes away with the checker; unlinking it first is fine
+    del checker
+    os.remove(path)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark safety DB lookups at several DB sizes")
+    parser.add_argument('--csv', default=os.path.join(BASE_DIR, 'medicine_safety.csv'))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 10000, 500000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='bench_safety.json')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    base_rows = read_csv_rows(args.csv)
+    report = {'config': vars(args), 'sizes': {}}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            print(f"🧪 {size} rows...")
+            result = bench_size(base_rows, size, args.queries, rng, tmp_dir)
+            report['sizes'][str(size)] = result
+            print(f"  exact p50 {result['exact_us'].get('p50')} µs, fuzzy p50 {result['fuzzy_us'].get('p50')} µs "
+                  f"(recall {result['fuzzy_recall']}), miss p50 {result['miss_us'].get('p50')} µs, "
+                  f"batch {result['batch_us_per_name']} µs/name")
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report written to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
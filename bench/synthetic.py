@@ -0,0 +1,104 @@
+import csv
+import json
+import os
+import cv2
+import numpy as np
+
+# Filler lines printed around the brand name, like on a real pack. They
+# exercise the skip patterns and scoring in identify_medicine_name.
+FILLER_LINES = [
+    'Tablets IP', 'Each film coated tablet contains', 'MRP: Rs {mrp}.00',
+    'BATCH NO. E{batch}/{lot}', 'MFG DATE 03/2024', 'EXP DATE 02/2027',
+    'Strip of 10 Tablets', 'Store below 30C', 'Schedule H Drug',
+    'Pharmaceuticals Pvt Ltd', 'Keep out of reach of children',
+]
+
+FONTS = [cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_TRIPLEX]
+
+
+def load_names(csv_path):
+    """Medicine names from the safety CSV, in file order, without duplicates"""
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        names = [row['medicine_name'].strip() for row in csv.DictReader(f)]
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def background(rng, height, width):
+    """Solid or two-colour gradient pack background (BGR)"""
+    start = rng.integers(120, 256, size=3)
+    if rng.random() < 0.5:
+        return np.full((height, width, 3), start, dtype=np.uint8)
+    end = rng.integers(120, 256, size=3)
+    ramp = np.linspace(0.0, 1.0, width)[None, :, None]
+    gradient = start[None, None, :] * (1 - ramp) + end[None, None, :] * ramp
+    return np.repeat(gradient, height, axis=0).astype(np.uint8)
+
+
+def render_pack(name, rng, width=900, height=600, max_angle=8.0, noise_sigma=8.0):
+    """BGR image of a synthetic medicine pack with `name` as the brand line"""
+    img = background(rng, height, width)
+    ink = tuple(int(c) for c in rng.integers(0, 90, size=3))
+    font = FONTS[int(rng.integers(len(FONTS)))]
+
+    # Brand name: the largest text, in the top third, scaled to fit
+    scale, thickness = 2.4, 4
+    (text_w, text_h), _ = cv2.getTextSize(name, font, scale, thickness)
+    if text_w > width - 80:
+        scale *= (width - 80) / text_w
+        (text_w, text_h), _ = cv2.getTextSize(name, font, scale, thickness)
+    x = int(rng.integers(30, max(31, width - text_w - 30)))
+    y = int(rng.integers(text_h + 30, height // 3 + text_h))
+    cv2.putText(img, name, (x, y), font, scale, ink, thickness, cv2.LINE_AA)
+
+    # Smaller filler lines below it
+    line_y = y + 60
+    for idx in rng.choice(len(FILLER_LINES), size=4, replace=False):
+        if line_y > height - 20:
+            break
+        line = FILLER_LINES[idx].format(
+            mrp=int(rng.integers(20, 400)), batch=int(rng.integers(10, 99)), lot=int(rng.integers(10, 99))
+        )
+        cv2.putText(img, line, (40, line_y), cv2.FONT_HERSHEY_SIMPLEX, 0.9, ink, 2, cv2.LINE_AA)
+        line_y += 55
+
+    # Camera-ish distortions: small rotation, sensor noise, slight blur
+    angle = float(rng.uniform(-max_angle, max_angle))
+    M = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    img = cv2.warpAffine(img, M, (width, height), borderMode=cv2.BORDER_REPLICATE)
+    noise = rng.normal(0, noise_sigma, img.shape)
+    img = np.clip(img.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+    if rng.random() < 0.3:
+        img = cv2.GaussianBlur(img, (3, 3), 0)
+    return img, {'angle': round(angle, 2)}
+
+
+def generate_dataset(csv_path, count, seed=0, out_dir=None):
+    """Render `count` packs deterministically from the CSV names
+
+    Returns a list of {'name', 'png', 'params'} samples; `png` holds the
+    encoded image so the benchmark includes decoding, like an upload. With
+    `out_dir` the PNGs and a manifest.json are written there as well.
+    """
+    rng = np.random.default_rng(seed)
+    names = load_names(csv_path)
+    picks = rng.choice(len(names), size=count, replace=count > len(names))
+
+    samples = []
+    for i, name_idx in enumerate(picks):
+        name = names[int(name_idx)]
+        img, params = render_pack(name, rng)
+        ok, png = cv2.imencode('.png', img)
+        if not ok:
+            raise RuntimeError(f"Could not encode synthetic image for {name}")
+        samples.append({'id': f"{i:05d}", 'name': name, 'png': png.tobytes(), 'params': params})
+
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+        for sample in samples:
+            with open(os.path.join(out_dir, f"{sample['id']}.png"), 'wb') as f:
+                f.write(sample['png'])
+        manifest = [{'id': s['id'], 'name': s['name'], **s['params']} for s in samples]
+        with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+            json.dump({'seed': seed, 'samples': manifest}, f, indent=2)
+
+    return samples
@@ -0,0 +1,261 @@
+import argparse
+import secrets
+import threading
+import time
+from collections import OrderedDict, deque
+import cv2
+import numpy as np
+from medicine_safety import normalize_name
+from metrics import metrics
+
+# Frames are gated on a grayscale copy downscaled to this long side
+GATE_SIZE = 320
+
+
+def frame_gray(frame, size=GATE_SIZE):
+    """Small grayscale copy of a BGR frame for the hash and sharpness gates"""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    scale = size / max(gray.shape[:2])
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray
+
+
+def dhash(gray):
+    """64-bit difference hash: near-identical frames differ in a few bits"""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def sharpness(gray):
+    """Variance of the Laplacian (low for motion blur and out-of-focus frames)"""
+    return float(cv2.Laplacian(gray, cv2.CV_64F).var())
+
+
+class FrameScanner:
+    """Scans one medicine pack from a stream of camera frames
+
+    Blurry frames are dropped, a new view (dHash distance) is OCR'd at once
+    and only the sharpest of every `window` near-duplicates is; candidates
+    are fused by summed score until the leader is stable.
+    """
+
+    def __init__(self, extractor, min_sharpness=40.0, hash_distance=6, window=5,
+                 stable_frames=3, max_ocr_frames=12):
+        self.extractor = extractor
+        self.min_sharpness = min_sharpness
+        self.hash_distance = hash_distance
+        self.window = window
+        self.stable_frames = stable_frames
+        self.max_ocr_frames = max_ocr_frames
+
+        self.frames_seen = 0
+        self.frames_ocr = 0
+        self.frames_skipped = {'blurry': 0, 'duplicate': 0, 'unreadable': 0}
+        self.votes = {}
+        self.recent = deque(maxlen=stable_frames)
+        self._view_hash = None
+        # Sharpest near-duplicate of the current window: (sharpness, frame)
+        self._pending = None
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        self.created_at = self.updated_at = time.time()
+
+    def gate(self, frame):
+        """The frame to OCR now (this one, a buffered sharper one or None) and the gate outcome"""
+        gray = frame_gray(frame)
+        frame_sharpness = sharpness(gray)
+        if frame_sharpness < self.min_sharpness:
+            return None, 'blurry'
+
+        frame_hash = dhash(gray)
+        if self._view_hash is None or hamming(frame_hash, self._view_hash) > self.hash_distance:
+            self._view_hash = frame_hash
+            self._pending, self._pending_count = None, 0
+            return frame, 'new'
+
+        if self._pending is None or frame_sharpness > self._pending[0]:
+            # Copied: camera loops may reuse their frame buffer
+            self._pending = (frame_sharpness, frame.copy())
+        self._pending_count += 1
+        if self._pending_count < self.window:
+            return None, 'duplicate'
+        frame = self._pending[1]
+        self._pending, self._pending_count = None, 0
+        return frame, 'duplicate'
+
+    def add_frame(self, frame):
+        """Feed one frame (BGR array or encoded bytes); returns the fused state"""
+        with self._lock:
+            self.updated_at = time.time()
+            self.frames_seen += 1
+            if not self.done:
+                if not isinstance(frame, np.ndarray):
+                    frame = self.extractor.load_image(frame)
+                if frame is None or frame.size == 0:
+                    selected, outcome = None, 'unreadable'
+                else:
+                    selected, outcome = self.gate(frame)
+                metrics.inc('mediscan_scan_frames_total', outcome=outcome)
+                if selected is not None:
+                    self.fuse(self.extractor.process_image(selected))
+                else:
+                    self.frames_skipped[outcome] += 1
+            return self.state()
+
+    def fuse(self, result):
+        """Add one OCR'd frame's candidates to the votes"""
+        self.frames_ocr += 1
+        if not result.get('success'):
+            self.recent.append(None)
+            return
+        counted = set()
+        for candidate in result['all_candidates']:
+            key = normalize_name(candidate['name'])
+            # One vote per name and frame: candidates are sorted, so the
+            # frame's best-scored read of a name is the one counted
+            if key in counted:
+                continue
+            counted.add(key)
+            vote = self.votes.setdefault(key, {
+                'name': candidate['name'], 'votes': 0.0, 'frames': 0, 'confidence': 0.0, 'best_score': 0.0
+            })
+            vote['votes'] = round(vote['votes'] + candidate['score'], 3)
+            vote['frames'] += 1
+            vote['confidence'] = max(vote['confidence'], candidate['confidence'])
+            # The spelling of the frame that scored it highest is shown
+            if candidate['score'] > vote['best_score']:
+                vote['name'], vote['best_score'] = candidate['name'], candidate['score']
+        self.recent.append(normalize_name(result['best_match']['name']))
+
+    def ranked(self):
+        return sorted(self.votes.items(), key=lambda item: item[1]['votes'], reverse=True)
+
+    @property
+    def stable(self):
+        ranked = self.ranked()
+        return (bool(ranked) and len(self.recent) == self.stable_frames
+                and all(name == ranked[0][0] for name in self.recent))
+
+    @property
+    def done(self):
+        return self.stable or self.frames_ocr >= self.max_ocr_frames
+
+    def result(self):
+        """state() read under the session lock, for readers outside add_frame"""
+        with self._lock:
+            return self.state()
+
+    def state(self):
+        """JSON-ready fused result, shaped like a process_image result (call with the lock held)"""
+        candidates = [
+            {'name': vote['name'], 'votes': vote['votes'], 'frames': vote['frames'], 'confidence': vote['confidence']}
+            for _, vote in self.ranked()[:10]
+        ]
+        return {
+            'success': bool(candidates),
+            'best_match': candidates[0] if candidates else None,
+            'all_candidates': candidates,
+            'stable': self.stable,
+            'done': self.done,
+            'frames_seen': self.frames_seen,
+            'frames_ocr': self.frames_ocr,
+            'frames_skipped': dict(self.frames_skipped),
+        }
+
+
+class ScanSessionStore:
+    """Open FrameScanner sessions by id, for frames arriving over separate requests
+
+    Sessions idle for `ttl` seconds are dropped, and the least recently
+    used ones once `max_sessions` are open.
+    """
+
+    def __init__(self, extractor, max_sessions=64, ttl=300, **scanner_kwargs):
+        self.extractor = extractor
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.scanner_kwargs = scanner_kwargs
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        while self._sessions:
+            session_id, scanner = next(iter(self._sessions.items()))
+            if now - scanner.updated_at <= self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+    def create(self):
+        """Open a session and return its id"""
+        session_id = secrets.token_hex(16)
+        with self._lock:
+            self._sessions[session_id] = FrameScanner(self.extractor, **self.scanner_kwargs)
+            self._expire(time.time())
+        return session_id
+
+    def get(self, session_id):
+        """The FrameScanner of a session, or None once closed or expired"""
+        with self._lock:
+            self._expire(time.time())
+            scanner = self._sessions.get(session_id)
+            if scanner is not None:
+                self._sessions.move_to_end(session_id)
+            return scanner
+
+    def close(self, session_id):
+        """Remove a session and return its scanner (or None)"""
+        with self._lock:
+            return self._sessions.pop(session_id, None)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+
+def scan_video(scanner, path, every=1):
+    """Feed every `every`-th frame of a video file until the scan is done"""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot open video: {path}")
+    state = scanner.result()
+    index = 0
+    try:
+        while not state['done']:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            if index % every == 0:
+                state = scanner.add_frame(frame)
+            index += 1
+    finally:
+        capture.release()
+    return state
+
+
+if __name__ == '__main__':
+    from medicine_extractor import MediScanExtractor
+    from medicine_safety import MedicineSafetyChecker
+
+    parser = argparse.ArgumentParser(description="Scan a medicine pack from a video file, as the webcam mode does")
+    parser.add_argument('video')
+    parser.add_argument('--every', type=int, default=1, help="Only consider every N-th frame")
+    parser.add_argument('--safety-db', default='medicine_safety.csv')
+    parser.add_argument('--lexicon', help="'safety_db' or a names file to snap candidates to")
+    parser.add_argument('--cascade', action='store_true')
+    args = parser.parse_args()
+
+    safety_checker = MedicineSafetyChecker(args.safety_db)
+    extractor = MediScanExtractor(cascade=args.cascade, safety_checker=safety_checker, lexicon=args.lexicon)
+    started = time.time()
+    state = scan_video(FrameScanner(extractor), args.video, every=args.every)
+    print(f"🎞️ {state['frames_seen']} frames, {state['frames_ocr']} OCR'd, skipped {state['frames_skipped']} "
+          f"in {time.time() - started:.1f}s ({'stable' if state['stable'] else 'not stable'})")
+    if state['best_match']:
+        print(f"🏆 Best Match: {state['best_match']['name']} ({state['best_match']['votes']} votes)")
+        print(f"🛡️ Safety: {safety_checker.check_safety(state['best_match']['name'])}")
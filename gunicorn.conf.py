@@ -0,0 +1,43 @@
+"""Gunicorn settings: preload-and-fork serving
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The master imports app.py once with the OCR model loaded
+(MEDISCAN_PRELOAD_MODEL=1), then forks the workers, which share the model
+weights copy-on-write instead of each loading their own copy. Each worker
+runs its warmup pass after the fork; /api/health/ready turns 200 once it
+is done.
+
+One worker by default, scaled with threads: the async job queue, the
+preview store, scan sessions and /api/metrics live in the worker process,
+so with MEDISCAN_WEB_WORKERS > 1 the follow-up requests of a job, preview
+or scan session must be routed back to the same worker (sticky sessions)
+and /api/metrics only reports the worker that answered.
+"""
+import multiprocessing
+import os
+
+os.environ.setdefault('MEDISCAN_PRELOAD_MODEL', '1')
+
+bind = os.environ.get('MEDISCAN_BIND', '0.0.0.0:8080')
+workers = int(os.environ.get('MEDISCAN_WEB_WORKERS', '1'))
+threads = int(os.environ.get('MEDISCAN_WEB_THREADS', str(min(8, 2 * multiprocessing.cpu_count()))))
+preload_app = True
+# A cold OCR request with every variant can take a while on small CPUs
+timeout = int(os.environ.get('MEDISCAN_WEB_TIMEOUT', '120'))
+
+
+def post_fork(server, worker):
+    import app
+    from job_queue import default_torch_threads
+
+    if app.app.config['TORCH_THREADS'] is None:
+        import torch
+        torch.set_num_threads(default_torch_threads(server.cfg.workers * max(1, app.app.config['OCR_PARALLELISM'])))
+
+    # The master's watcher thread does not survive the fork
+    if app.SAFETY_DB_WATCH_INTERVAL > 0:
+        app.safety_checker.start_watching(app.SAFETY_DB_WATCH_INTERVAL)
+
+    if app.app.config['WARMUP']:
+        app.start_warmup()
@@ -0,0 +1,242 @@
+import copy
+import multiprocessing as mp
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from multiprocessing.connection import wait
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue is at capacity (maps to HTTP 429)"""
+
+
+def default_torch_threads(processes):
+    """Torch intra-op threads for each of `processes` OCR processes (or passes) sharing the cores"""
+    return max(1, (os.cpu_count() or 1) // max(1, processes))
+
+
+def spawn_context():
+    """multiprocessing context for OCR worker processes"""
+    # spawn, not fork: forking a process with torch threads running can deadlock
+    return mp.get_context('spawn')
+
+
+def _worker_main(tasks, events, extractor_kwargs, safety_db_path, current_job):
+    """Worker process: load one extractor, then process jobs until told to stop"""
+    from medicine_extractor import MediScanExtractor
+    from medicine_safety import MedicineSafetyChecker
+
+    # The worker's own checker only drives the cascade early exit; the app
+    # attaches safety info from its (hot-reloadable) checker when serving.
+    safety_checker = MedicineSafetyChecker(safety_db_path) if safety_db_path else None
+    extractor = MediScanExtractor(safety_checker=safety_checker, **extractor_kwargs)
+    extractor.warmup()
+    events.send(('ready', os.getpid(), None))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job_id, image = task
+        # Shared memory: the parent knows the job even if this process dies
+        # before its 'started' event is sent
+        current_job.value = job_id.encode('ascii')
+        events.send(('started', job_id, time.time()))
+        result = extractor.process_image(image)
+        events.send(('done', job_id, (result, time.time())))
+
+
+class ExtractionJobQueue:
+    """Bounded queue of extraction jobs served by a pool of worker processes
+
+    Finished jobs are kept for `job_ttl` seconds (at most `max_finished`).
+    """
+
+    def __init__(self, num_workers=2, max_pending=32, extractor_kwargs=None,
+                 safety_db_path=None, job_ttl=600, max_finished=1000):
+        self.num_workers = num_workers
+        self.max_pending = max_pending
+        self.extractor_kwargs = extractor_kwargs or {}
+        self.safety_db_path = safety_db_path
+        self.job_ttl = job_ttl
+        self.max_finished = max_finished
+
+        self._ctx = spawn_context()
+        self._tasks = self._ctx.Queue()
+
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._done_events = {}
+        self._ready_workers = set()
+        self._counters = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0}
+        self._total_queue_ms = 0.0
+        self._total_processing_ms = 0.0
+
+        # Per worker: the process, the read end of its event pipe and the id
+        # of the job it dequeued last
+        self._workers = [None] * num_workers
+        self._events = [None] * num_workers
+        self._current_jobs = [self._ctx.Array('c', 32) for _ in range(num_workers)]
+        for i in range(num_workers):
+            self._start_worker(i)
+        self._closed = False
+        self._collector = threading.Thread(target=self._collect, name='job-collector', daemon=True)
+        self._collector.start()
+
+    def _start_worker(self, i):
+        self._current_jobs[i].value = b''
+        # A pipe written with blocking sends: a crash never loses events already sent
+        events, worker_events = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self._tasks, worker_events, self.extractor_kwargs, self.safety_db_path, self._current_jobs[i]),
+            daemon=True
+        )
+        process.start()
+        # Only the worker holds the write end, so its exit closes the pipe
+        worker_events.close()
+        self._workers[i] = process
+        self._events[i] = events
+
+    def submit(self, image, meta=None):
+        """Queue an image (path, encoded bytes or BGR array) and return its job id"""
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job['status'] in ('queued', 'running'))
+            if pending >= self.max_pending:
+                self._counters['rejected'] += 1
+                raise QueueFullError(f"Job queue full ({pending} pending)")
+
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                'id': job_id,
+                'status': 'queued',
+                'submitted_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'queue_ms': None,
+                'processing_ms': None,
+                'result': None,
+                'meta': meta or {}
+            }
+            self._done_events[job_id] = threading.Event()
+            self._counters['submitted'] += 1
+            self._evict_finished()
+
+        self._tasks.put((job_id, image))
+        return job_id
+
+    def get(self, job_id, wait=0):
+        """Deep copy of a job's state (the caller may modify it), or None; waits up to `wait` seconds for it to finish"""
+        with self._lock:
+            done = self._done_events.get(job_id)
+        if done is None:
+            return None
+        if wait > 0:
+            done.wait(wait)
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job is not None else None
+
+    def stats(self):
+        """Queue depth, worker and timing counters"""
+        with self._lock:
+            statuses = [job['status'] for job in self._jobs.values()]
+            finished = self._counters['completed'] + self._counters['failed']
+            return {
+                'workers': self.num_workers,
+                'workers_ready': len(self._ready_workers),
+                'max_pending': self.max_pending,
+                'queued': statuses.count('queued'),
+                'running': statuses.count('running'),
+                **self._counters,
+                'avg_queue_ms': round(self._total_queue_ms / finished, 2) if finished else None,
+                'avg_processing_ms': round(self._total_processing_ms / finished, 2) if finished else None,
+            }
+
+    def shutdown(self):
+        """Stop the workers once they finish their current job"""
+        self._closed = True
+        for _ in self._workers:
+            self._tasks.put(None)
+        for process in self._workers:
+            process.join(timeout=10)
+
+    def _collect(self):
+        """Apply worker events to the job table; respawn crashed workers"""
+        while not self._closed:
+            # Wakes up for an event or for a worker exiting
+            wait(self._events + [process.sentinel for process in self._workers], timeout=1.0)
+            for events in self._events:
+                self._drain(events)
+            self._check_workers()
+
+    def _drain(self, events):
+        """Apply every event waiting in one worker's pipe"""
+        try:
+            while events.poll():
+                self._apply_event(*events.recv())
+        except (EOFError, OSError):
+            pass
+
+    def _apply_event(self, kind, key, payload):
+        """Apply one worker event to the job table"""
+        with self._lock:
+            if kind == 'ready':
+                self._ready_workers.add(key)
+                return
+
+            job = self._jobs.get(key)
+            if job is None:
+                return
+
+            if kind == 'started' and job['finished_at'] is None:
+                started_at = payload
+                job['status'] = 'running'
+                job['started_at'] = started_at
+                job['queue_ms'] = round((started_at - job['submitted_at']) * 1000, 2)
+            elif kind == 'done' and job['finished_at'] is None:
+                result, finished_at = payload
+                self._finish(job, result, finished_at)
+
+    def _finish(self, job, result, finished_at):
+        job['result'] = result
+        job['status'] = 'done' if result.get('success') else 'failed'
+        job['finished_at'] = finished_at
+        started_at = job['started_at'] or finished_at
+        if job['queue_ms'] is None:
+            job['queue_ms'] = round((started_at - job['submitted_at']) * 1000, 2)
+        job['processing_ms'] = round((finished_at - started_at) * 1000, 2)
+
+        self._counters['completed' if result.get('success') else 'failed'] += 1
+        self._total_queue_ms += job['queue_ms']
+        self._total_processing_ms += job['processing_ms']
+        self._done_events[job['id']].set()
+
+    def _check_workers(self):
+        for i, process in enumerate(self._workers):
+            if process.is_alive() or self._closed:
+                continue
+            print(f"⚠️ Extraction worker {process.pid} died (exit code {process.exitcode}), restarting")
+            # Everything it sent before dying, e.g. the 'done' of its last job
+            self._drain(self._events[i])
+            self._events[i].close()
+            with self._lock:
+                self._ready_workers.discard(process.pid)
+                # Its last job, unless that one finished before the crash
+                job = self._jobs.get(self._current_jobs[i].value.decode('ascii'))
+                if job is not None and job['finished_at'] is None:
+                    self._finish(job, {'success': False, 'error': 'Worker crashed while processing the image'}, time.time())
+            self._start_worker(i)
+
+    def _evict_finished(self):
+        """Drop finished jobs past their TTL, then the oldest beyond max_finished"""
+        now = time.time()
+        finished = [job_id for job_id, job in self._jobs.items() if job['finished_at'] is not None]
+        expired = {job_id for job_id in finished if now - self._jobs[job_id]['finished_at'] > self.job_ttl}
+        kept = [job_id for job_id in finished if job_id not in expired]
+        overflow = max(0, len(kept) - self.max_finished)
+        for job_id in list(expired) + kept[:overflow]:
+            del self._jobs[job_id]
+            del self._done_events[job_id]
@@ -1,60 +1,537 @@
 import cv2
-import easyocr
 import numpy as np
-from PIL import Image
 import re
-import os
-from collections import Counter
+import math
+import contextvars
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from metrics import metrics
+from ocr_backend import create_reader
+from job_queue import default_torch_threads
+from medicine_lexicon import load_lexicon
+from medicine_safety import normalize_name
+from ocr_scheduler import RecognitionScheduler
+from medicine_scoring import CandidateScorer, ScoringConfig, clean_medicine_name, is_valid_text
+
+# Image geometry: each OCR'd frame keeps a 2x3 affine transform from its
+# pixel coordinates back to the uploaded image, so boxes found on resized,
+# cropped or deskewed frames can be reported in original coordinates.
+
+def scaling(sx, sy):
+    return np.array([[sx, 0.0, 0.0], [0.0, sy, 0.0]])
+
+
+def translation(dx, dy):
+    return np.array([[1.0, 0.0, dx], [0.0, 1.0, dy]])
+
+
+def compose(outer, inner):
+    """Transform applying `inner` first, then `outer`"""
+    return np.vstack([outer, [0, 0, 1]]).dot(np.vstack([inner, [0, 0, 1]]))[:2]
+
+
+def map_bbox(bbox, transform):
+    """Apply a 2x3 transform to a [[x, y], ...] box"""
+    points = np.asarray(bbox, dtype=np.float64)
+    return (points.dot(transform[:, :2].T) + transform[:, 2]).tolist()
+
+
+def pairwise_iou(a, b):
+    """Intersection-over-union of matching rows of two (n, 4) x0, y0, x1, y1 box arrays"""
+    width = np.clip(np.minimum(a[:, 2], b[:, 2]) - np.maximum(a[:, 0], b[:, 0]), 0, None)
+    height = np.clip(np.minimum(a[:, 3], b[:, 3]) - np.maximum(a[:, 1], b[:, 1]), 0, None)
+    intersection = width * height
+    union = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1]) + (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]) - intersection
+    return intersection / np.maximum(union, 1e-9)
+
+
+def overlap_pairs(boxes, threshold):
+    """Index arrays (i, j) of the box pairs with IoU >= threshold"""
+    # Sweep by top edge: a box is only paired with the boxes starting above its bottom edge
+    order = np.argsort(boxes[:, 1], kind='stable')
+    ordered = boxes[order]
+    count = len(boxes)
+    ends = np.searchsorted(ordered[:, 1], ordered[:, 3], side='left')
+    partners = np.maximum(ends - np.arange(count) - 1, 0)
+    first = np.repeat(np.arange(count), partners)
+    offsets = np.arange(len(first)) - np.repeat(np.cumsum(partners) - partners, partners)
+    second = first + 1 + offsets
+    close = pairwise_iou(ordered[first], ordered[second]) >= threshold
+    return order[first[close]], order[second[close]]
+
+
+def overlap_clusters(boxes, threshold):
+    """Cluster label per box: connected components of the IoU >= threshold graph"""
+    parent = list(range(len(boxes)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in zip(*overlap_pairs(boxes, threshold)):
+        a, b = root(int(i)), root(int(j))
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+    return [root(i) for i in range(len(boxes))]
+
+
+class VariantSource:
+    """Preprocessing variants of one image, rendered only when OCR asks for them"""
+    FRAME_VARIANTS = ('original', 'deskewed')
+    BILATERAL_VARIANTS = ('bilateral', 'otsu', 'otsu_inverted', 'morphological')
+
+    def __init__(self, extractor, frames, working_img):
+        self.extractor = extractor
+        self.frames = frames
+        self.working_img = working_img
+        self.strategies = [s for s in self.FRAME_VARIANTS if s in frames] + ['lab_enhanced', *self.BILATERAL_VARIANTS]
+        self._lock = threading.Lock()
+        self._bilateral_lock = threading.Lock()
+        self._free = []
+        self._bilateral = None
+        self._bilateral_pending = set(self.BILATERAL_VARIANTS)
+        self._bytes = sum({id(image): image.nbytes for image, _ in frames.values()}.values())
+        self.peak_bytes = self._bytes
+
+    def _track(self, nbytes):
+        with self._lock:
+            self._bytes += nbytes
+            self.peak_bytes = max(self.peak_bytes, self._bytes)
+
+    def shape(self, strategy):
+        """(height, width) of a variant, without rendering it"""
+        if strategy in self.FRAME_VARIANTS:
+            return self.frames[strategy][0].shape[:2]
+        return self.working_img.shape[:2]
+
+    def take(self, strategy):
+        """A variant's image; pass it to release() when done with it"""
+        if strategy in self.FRAME_VARIANTS or strategy == 'bilateral':
+            return self.render(strategy)
+        with self._lock:
+            dst = self._free.pop() if self._free else None
+        if dst is None:
+            dst = np.empty(self.working_img.shape[:2], dtype=np.uint8)
+            self._track(dst.nbytes)
+        return self.render(strategy, dst)
+
+    def release(self, strategy, image):
+        """Return a variant's buffer for reuse by the next variant"""
+        if strategy not in self.FRAME_VARIANTS and strategy != 'bilateral':
+            with self._lock:
+                self._free.append(image)
+
+    def render(self, strategy, dst=None):
+        """Render one variant, into `dst` when given"""
+        if strategy in self.FRAME_VARIANTS:
+            return self.frames[strategy][0]
+        if strategy == 'lab_enhanced':
+            # LAB and BGR copies of the working image exist during the conversion
+            transient = 2 * self.working_img.nbytes
+            self._track(transient)
+            try:
+                return self.extractor.enhance_lab(self.working_img, dst)
+            finally:
+                self._track(-transient)
+
+        bilateral = self.bilateral(strategy)
+        if strategy == 'bilateral':
+            return bilateral
+        if strategy == 'morphological':
+            return self.extractor.morphological_cleanup(bilateral, dst)
+        return self.extractor.otsu_threshold(bilateral, inverted=strategy == 'otsu_inverted', dst=dst)
+
+    def bilateral(self, strategy):
+        """The bilateral-filtered image, computed once and dropped after its last user"""
+        # Held while filtering, so concurrent first users wait for one run
+        with self._bilateral_lock:
+            if self._bilateral is None:
+                self._bilateral = self.extractor.bilateral_filter(self.working_img)
+                self._track(self._bilateral.nbytes)
+            bilateral = self._bilateral
+            self._bilateral_pending.discard(strategy)
+            if not self._bilateral_pending:
+                self._bilateral = None
+                self._track(-bilateral.nbytes)
+        return bilateral
+
+    def close(self):
+        """Drop the cached and pooled buffers and record the peak bytes"""
+        with self._bilateral_lock, self._lock:
+            self._free = []
+            self._bilateral = None
+        metrics.observe('mediscan_preprocess_peak_bytes', self.peak_bytes)
+
 
 class MediScanExtractor:
-    def __init__(self):
+    # Priority order used by cascade mode: the full-colour variants read clean
+    # packs best, the binarised ones are fallbacks for hard images.
+    DEFAULT_VARIANT_ORDER = [
+        'original', 'deskewed', 'lab_enhanced', 'bilateral',
+        'otsu', 'otsu_inverted', 'morphological'
+    ]
+
+    # Text detector settings (lower thresholds for better detection)
+    DETECT_PARAMS = {'text_threshold': 0.6, 'low_text': 0.3}
+
+    # ROI cropping: text lines are located on a copy downscaled to this long
+    # side, and a crop is only used when it drops enough of the frame
+    ROI_SCAN_SIZE = 640
+    ROI_MAX_FRACTION = 0.85
+
+    # Hits of different variants overlapping at least this much (IoU) are
+    # reads of the same text region and get merged
+    MERGE_IOU = 0.5
+
+    # Deskew: the angle is estimated on a copy downscaled to this long side;
+    # tilts up to DESKEW_MAX_ANGLE are searched, below DESKEW_MIN_ANGLE ignored
+    DESKEW_METHODS = ('hough', 'min_area_rect', 'projection')
+    DESKEW_SCAN_SIZE = 512
+    DESKEW_MIN_ANGLE = 0.5
+    DESKEW_MAX_ANGLE = 15.0
+
+    # Cascade: a best candidate snapped to the lexicon ends OCR once its
+    # OCR confidence (percent) reaches this
+    LEXICON_EXIT_CONFIDENCE = 50.0
+
+    def __init__(self, cascade=False, variant_order=None, early_exit_score=1.2,
+                 early_exit_confidence=80.0, safety_checker=None,
+                 shared_detection=False, batch_size=16, parallelism=1,
+                 torch_threads=None, scoring=None, lazy=False, backend='torch',
+                 onnx_dir=None, roi=False, deskew_method='hough', lexicon=None,
+                 batch_wait_ms=0.0, batch_max_crops=64):
         """Initialize EasyOCR reader - optimized for M1 Mac"""
-        print("🚀 Initializing AI Model (this may take a moment)...")
-        # EasyOCR with GPU support on M1 if available
-        self.reader = easyocr.Reader(['en'], gpu=False)
-        print("✅ AI Model Ready!")
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        self._warmup_lock = threading.Lock()
+        self._warm = False
+
+        self.cascade = cascade
+        self.variant_order = list(variant_order or self.DEFAULT_VARIANT_ORDER)
+        self.early_exit_score = early_exit_score
+        self.early_exit_confidence = early_exit_confidence
+        self.safety_checker = safety_checker
+        self.shared_detection = shared_detection
+        self.batch_size = batch_size
+        self.parallelism = max(1, parallelism)
+        self.torch_threads = torch_threads
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.roi = roi
+        if deskew_method not in self.DESKEW_METHODS:
+            raise ValueError(f"Unknown deskew method: {deskew_method}")
+        self.deskew_method = deskew_method
+        self.lexicon = lexicon
+        self._lexicon = load_lexicon(lexicon, safety_checker) if lexicon else None
+        self.scorer = CandidateScorer(scoring or ScoringConfig())
+
+        self.batch_wait_ms = batch_wait_ms
+        self.batch_max_crops = batch_max_crops
+        self._scheduler = None
+        if batch_wait_ms > 0:
+            # Each coalesced batch is one recognizer call of up to batch_max_crops crops
+            self._scheduler = RecognitionScheduler(
+                lambda jobs: self.recognize_batch(jobs, batch_size=batch_max_crops),
+                max_wait_ms=batch_wait_ms, max_batch=batch_max_crops
+            )
+
+        self._pool = None
+        if self.parallelism > 1:
+            self._pool = ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix='mediscan-ocr')
+            if torch_threads is None:
+                torch_threads = default_torch_threads(self.parallelism)
+        # Applied when the model loads, so constructing an extractor doesn't import torch
+        self._num_threads = torch_threads
         
-    def deskew_image(self, image):
-      """Detect and correct image rotation"""
-      try:
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+        if not lazy:
+            self.load_model()
+    
+    @property
+    def reader(self):
+        """The EasyOCR reader, loaded on first access"""
+        reader = self._reader
+        if reader is None:
+            reader = self.load_model()
+        return reader
+    
+    @reader.setter
+    def reader(self, reader):
+        self._reader = reader
+    
+    def load_model(self):
+        """Load the EasyOCR reader once; concurrent callers wait for the same load"""
+        with self._reader_lock:
+            if self._reader is None:
+                print(f"🚀 Initializing AI Model ({self.backend} backend, this may take a moment)...")
+                if self._num_threads:
+                    import torch
+                    torch.set_num_threads(self._num_threads)
+                with metrics.timer('model_load'):
+                    self._reader = create_reader(self.backend, onnx_dir=self.onnx_dir, threads=self.torch_threads)
+                print("✅ AI Model Ready!")
+            return self._reader
+    
+    def warmup(self):
+        """Load the model and run one OCR pass on a tiny image"""
+        with self._warmup_lock:
+            if self._warm:
+                return
+            reader = self.load_model()
+            started = time.time()
+            img = np.full((64, 256, 3), 255, dtype=np.uint8)
+            cv2.putText(img, 'MEDISCAN 500', (8, 44), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 0), 2)
+            with metrics.timer('warmup'):
+                reader.readtext(img, paragraph=False, **self.DETECT_PARAMS)
+            self._warm = True
+            print(f"🔥 AI Model warmed up in {time.time() - started:.2f}s")
+    
+    @property
+    def is_ready(self):
+        """True once the model is loaded and warmed up"""
+        return self._warm
+    
+    def model_state(self):
+        """'not_loaded', 'loading', 'loaded' or 'ready' (warmed up)"""
+        if self._warm:
+            return 'ready'
+        if self._reader is not None:
+            return 'loaded'
+        return 'loading' if self._reader_lock.locked() else 'not_loaded'
         
+    def init_kwargs(self):
+        """Constructor arguments that recreate this pipeline (e.g. in a worker process)"""
+        return {
+            'cascade': self.cascade,
+            'variant_order': self.variant_order,
+            'early_exit_score': self.early_exit_score,
+            'early_exit_confidence': self.early_exit_confidence,
+            'shared_detection': self.shared_detection,
+            'batch_size': self.batch_size,
+            'parallelism': self.parallelism,
+            'torch_threads': self.torch_threads,
+            'scoring': self.scorer.config,
+            'backend': self.backend,
+            'onnx_dir': self.onnx_dir,
+            'roi': self.roi,
+            'deskew_method': self.deskew_method,
+            'lexicon': self.lexicon,
+            'batch_wait_ms': self.batch_wait_ms,
+            'batch_max_crops': self.batch_max_crops
+        }
+
+    def config_fingerprint(self):
+        """Settings that change extraction output (used as part of cache keys)"""
+        config = self.init_kwargs()
+        # Throughput knobs that don't change results (parallelism stays: it
+        # sets how many variants run between cascade checks)
+        del config['batch_size']
+        del config['torch_threads']
+        del config['batch_wait_ms']
+        del config['batch_max_crops']
+        del config['onnx_dir']
+        config['detect_params'] = self.DETECT_PARAMS
+        config['merge_iou'] = self.MERGE_IOU
+        config['scoring'] = self.scorer.config.as_dict()
+        # Snapped names and the cascade's safety DB exit depend on the data
+        # they are checked against, so a reload changes the key
+        if self.safety_checker is not None and (self.cascade or self.lexicon == 'safety_db'):
+            config['safety_db'] = self.safety_checker.digest
+        if self._lexicon is not None and self.lexicon != 'safety_db':
+            config['lexicon_digest'] = self._lexicon.digest
+        return config
+        
+    def deskew_image(self, image):
+        """Detect and correct image rotation"""
+        angle = self.skew_angle(image)
+        if not angle:
+            return image
+        return self.rotate_image(image, self.rotation_matrix(image, angle))
+
+    def skew_angle(self, image):
+        """Rotation angle (degrees) that straightens the text, or 0.0 if it is straight enough"""
+        try:
+            small, _ = self.downscale_gray(image, self.DESKEW_SCAN_SIZE)
+            if self.deskew_method == 'projection':
+                angle = self.projection_skew(small)
+            elif self.deskew_method == 'min_area_rect':
+                angle = self.min_area_rect_skew(small)
+            else:
+                angle = self.hough_skew(small)
+        except Exception as e:
+            print(f"    ⚠️ Deskew failed: {e}, using original image")
+            return 0.0
+
+        # Only rotate if angle is significant
+        if angle is None or abs(angle) <= self.DESKEW_MIN_ANGLE:
+            return 0.0
+        return float(angle)
+
+    def hough_skew(self, small):
+        """Median angle of the strongest Hough lines, ignoring near-vertical edges"""
         # Detect edges
-        edges = cv2.Canny(gray, 50, 150, apertureSize=3)
+        edges = cv2.Canny(small, 50, 150, apertureSize=3)
         
-        # Detect lines using Hough Transform
-        lines = cv2.HoughLines(edges, 1, np.pi/180, 200)
+        # Detect lines using Hough Transform; the vote threshold scales
+        # with the image (200 votes at the old 2048px working size)
+        votes = max(40, int(200 * max(small.shape[:2]) / 2048))
+        lines = cv2.HoughLines(edges, 1, np.pi/180, votes)
+        if lines is None:
+            return None
         
-        if lines is not None and len(lines) > 0:
-            # Calculate average angle
-            angles = []
-            for line in lines[:20]:  # Use first 20 lines
-                rho, theta = line[0]  # Extract from nested array
-                angle = np.degrees(theta) - 90
+        angles = []
+        for line in lines[:20]:  # Use first 20 lines
+            rho, theta = line[0]  # Extract from nested array
+            angle = np.degrees(theta) - 90
+            # Pack sides and table rules are not text baselines
+            if abs(angle) <= self.DESKEW_MAX_ANGLE:
                 angles.append(angle)
-            
-            if angles: 
-                median_angle = np.median(angles)
-                
-                # Only rotate if angle is significant
-                if abs(median_angle) > 0.5:
-                    # Rotate image
-                    (h, w) = image.shape[:2]
-                    center = (w // 2, h // 2)
-                    M = cv2.getRotationMatrix2D(center, median_angle, 1.0)
-                    rotated = cv2.warpAffine(image, M, (w, h), 
-                                            flags=cv2.INTER_CUBIC, 
-                                            borderMode=cv2.BORDER_REPLICATE)
-                    return rotated
-      except Exception as e:
-        print(f"    ⚠️ Deskew failed: {e}, using original image")
+        return np.median(angles) if angles else None
+
+    def min_area_rect_skew(self, small):
+        """Median tilt of the minimum-area rectangles around text line blobs"""
+        lines = cv2.morphologyEx(self.text_mask(small), cv2.MORPH_CLOSE,
+                                 cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+        contours, _ = cv2.findContours(lines, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        angles = []
+        for contour in contours:
+            (_, _), (w, h), angle = cv2.minAreaRect(contour)
+            if max(w, h) < 20 or max(w, h) < 2 * min(w, h):
+                continue  # not line-shaped
+            # OpenCV reports the angle of the rectangle's first side; turn it
+            # into the tilt of the long side, in (-90, 90]
+            if w < h:
+                angle -= 90
+            if angle <= -90:
+                angle += 180
+            elif angle > 90:
+                angle -= 180
+            if abs(angle) <= self.DESKEW_MAX_ANGLE:
+                angles.append(angle)
+        return np.median(angles) if angles else None
+
+    def projection_skew(self, small):
+        """Angle giving the sharpest row profile of the text pixels"""
+        mask = self.text_mask(small)
+        if not cv2.countNonZero(mask):
+            return None
+        h, w = mask.shape[:2]
+
+        def sharpness(angle):
+            rotated = cv2.warpAffine(mask, cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0), (w, h),
+                                     flags=cv2.INTER_NEAREST)
+            profile = rotated.sum(axis=1, dtype=np.float64)
+            return float(np.sum(np.diff(profile) ** 2))
+
+        coarse = max(np.arange(-self.DESKEW_MAX_ANGLE, self.DESKEW_MAX_ANGLE + 0.5, 1.0), key=sharpness)
+        return max(np.arange(coarse - 1.0, coarse + 1.05, 0.1), key=sharpness)
+
+    def rotation_matrix(self, image, angle):
+        """Rotation by `angle` degrees about the image centre"""
+        (h, w) = image.shape[:2]
+        center = (w // 2, h // 2)
+        return cv2.getRotationMatrix2D(center, angle, 1.0)
+
+    def rotate_image(self, image, rotation):
+        """Apply a deskew rotation matrix, keeping the frame size"""
+        (h, w) = image.shape[:2]
+        return cv2.warpAffine(image, rotation, (w, h),
+                              flags=cv2.INTER_CUBIC,
+                              borderMode=cv2.BORDER_REPLICATE)
+
+    def downscale_gray(self, image, size):
+        """Grayscale copy with its long side at most `size`, and the scale used"""
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+        height, width = gray.shape[:2]
+        scale = min(1.0, size / max(height, width))
+        if scale < 1.0:
+            gray = cv2.resize(gray, (max(1, int(width * scale)), max(1, int(height * scale))),
+                              interpolation=cv2.INTER_AREA)
+        return gray, scale
+
+    def text_mask(self, gray):
+        """Binary mask of strong edges (where characters are)"""
+        gradient = cv2.morphologyEx(gray, cv2.MORPH_GRADIENT, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3)))
+        _, edges = cv2.threshold(gradient, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return edges
+
+    def text_line_boxes(self, image):
+        """Rough (x, y, w, h) boxes of text lines, found on a downscaled copy"""
+        small, scale = self.downscale_gray(image, self.ROI_SCAN_SIZE)
+        edges = self.text_mask(small)
+        lines = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, cv2.getStructuringElement(cv2.MORPH_RECT, (9, 1)))
+        # RETR_LIST: text printed inside a pack outline must not be hidden by it
+        contours, _ = cv2.findContours(lines, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+
+        small_h, small_w = small.shape[:2]
+        boxes = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            # Too small to be text, taller than wide, or the frame/pack outline
+            if h < 6 or w < 12 or w < h or (w > 0.9 * small_w and h > 0.5 * small_h):
+                continue
+            # Text blobs are mostly edge pixels; smooth gradients and noise are not
+            if cv2.countNonZero(edges[y:y + h, x:x + w]) < 0.2 * w * h:
+                continue
+            boxes.append((x / scale, y / scale, w / scale, h / scale))
+        return boxes
+
+    def crop_box(self, image, boxes, pad):
+        """Integer (x, y, w, h) around `boxes` plus `pad` pixels, clipped to the image"""
+        height, width = image.shape[:2]
+        x0 = max(0, int(min(x for x, _, _, _ in boxes) - pad))
+        y0 = max(0, int(min(y for _, y, _, _ in boxes) - pad))
+        x1 = min(width, int(math.ceil(max(x + w for x, _, w, _ in boxes) + pad)))
+        y1 = min(height, int(math.ceil(max(y + h for _, y, _, h in boxes) + pad)))
+        return x0, y0, x1 - x0, y1 - y0
+
+    def find_label_roi(self, image):
+        """(x, y, w, h) of the area holding text, or None to keep the whole frame"""
+        boxes = self.text_line_boxes(image)
+        if not boxes:
+            return None
+        pad = 0.02 * max(image.shape[:2]) + max(h for _, _, _, h in boxes)
+        roi = self.crop_box(image, boxes, pad)
+        if roi[2] * roi[3] > self.ROI_MAX_FRACTION * image.shape[0] * image.shape[1]:
+            return None
+        return roi
+
+    def find_text_band(self, image):
+        """(x, y, w, h) of the lines with the largest text, or None to keep the whole frame"""
+        boxes = self.text_line_boxes(image)
+        if not boxes:
+            return None
+        tallest = max(h for _, _, _, h in boxes)
+        largest = [box for box in boxes if box[3] >= 0.6 * tallest]
+        band = self.crop_box(image, largest, 0.6 * tallest)
+        if band[2] * band[3] > self.ROI_MAX_FRACTION * image.shape[0] * image.shape[1]:
+            return None
+        return band
     
-      return image
+    def load_image(self, image):
+        """Read an image from a file path or encoded bytes, or pass a BGR array through"""
+        if isinstance(image, np.ndarray):
+            return image
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            # Decode straight from memory, no temp file
+            return cv2.imdecode(np.frombuffer(image, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return cv2.imread(image)
     
-    def preprocess_image(self, image_path):
+    def preprocess_image(self, image_path, frames=None):
         """Advanced image preprocessing with multiple strategies"""
+        source = self.prepare_variants(image_path, frames=frames)
+        try:
+            return [(strategy, source.render(strategy)) for strategy in source.strategies]
+        finally:
+            source.close()
+
+    def prepare_variants(self, image_path, frames=None):
+        """Decode, resize, crop and deskew an image; returns its VariantSource and fills `frames` with name -> (image, transform)"""
         # Read image
-        img = cv2.imread(image_path)
+        with metrics.timer('decode'):
+            img = self.load_image(image_path)
         
         if img is None:
             raise ValueError("Could not read image")
@@ -63,129 +540,355 @@ class MediScanExtractor:
         height, width = img.shape[:2]
         max_dimension = 2048
         
-        if max(height, width) > max_dimension:
-            scale = max_dimension / max(height, width)
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_AREA)
-        elif max(height, width) < 800:
-            # Upscale small images
-            scale = 800 / max(height, width)
-            new_width = int(width * scale)
-            new_height = int(height * scale)
-            img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
+        with metrics.timer('resize'):
+            if max(height, width) > max_dimension:
+                scale = max_dimension / max(height, width)
+                new_width = int(width * scale)
+                new_height = int(height * scale)
+                img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_AREA)
+            elif max(height, width) < 800:
+                # Upscale small images
+                scale = 800 / max(height, width)
+                new_width = int(width * scale)
+                new_height = int(height * scale)
+                img = cv2.resize(img, (new_width, new_height), interpolation=cv2.INTER_CUBIC)
+        to_original = scaling(width / img.shape[1], height / img.shape[0])
         
-        original = img.copy()
+        # Only the label area goes on to OCR
+        if self.roi:
+            with metrics.timer('roi'):
+                label = self.find_label_roi(img)
+            if label is not None:
+                x, y, w, h = label
+                # A copy, so the full frame can be freed
+                img = np.ascontiguousarray(img[y:y + h, x:x + w])
+                to_original = compose(to_original, translation(x, y))
         
-        # Try to deskew
-        deskewed = self.deskew_image(img)
+        # Try to deskew: the angle comes from a small copy, and the one
+        # rotation is shared by every variant derived from the deskewed image
+        with metrics.timer('deskew'):
+            angle = self.skew_angle(img)
+            rotation = self.rotation_matrix(img, angle) if angle else None
+            deskewed = img if rotation is None else self.rotate_image(img, rotation)
         
-        # Create multiple preprocessed versions
-        preprocessed_images = []
+        if frames is None:
+            frames = {}
         
-        # Version 1: Original high quality
-        preprocessed_images.append(("original", original))
+        # Version 1: Original high quality (nothing writes to the frames,
+        # so no defensive copy)
+        frames['original'] = (img, to_original)
         
         # Version 2: Deskewed
-        if not np.array_equal(deskewed, img):
-            preprocessed_images. append(("deskewed", deskewed))
+        if rotation is not None:
+            to_original = compose(to_original, cv2.invertAffineTransform(rotation))
+            frames['deskewed'] = (deskewed, to_original)
         
         # Work with deskewed for further processing
         working_img = deskewed
         
-        # Version 3: White background enhancement
+        # The costlier variants only need the largest text, usually the brand name
+        if self.roi:
+            with metrics.timer('roi'):
+                band = self.find_text_band(working_img)
+            if band is not None:
+                x, y, w, h = band
+                working_img = working_img[y:y + h, x:x + w].copy()
+                frames['band'] = (working_img, compose(to_original, translation(x, y)))
+        
+        return VariantSource(self, frames, working_img)
+    
+    def enhance_lab(self, working_img, dst=None):
+        """Version 3: White background enhancement"""
         # This helps with colorful packaging
-        lab = cv2.cvtColor(working_img, cv2.COLOR_BGR2LAB)
-        l, a, b = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
-        cl = clahe.apply(l)
-        enhanced_lab = cv2.merge((cl,a,b))
-        enhanced_bgr = cv2.cvtColor(enhanced_lab, cv2.COLOR_LAB2BGR)
-        gray_enhanced = cv2.cvtColor(enhanced_bgr, cv2.COLOR_BGR2GRAY)
-        preprocessed_images.append(("lab_enhanced", gray_enhanced))
-        
-        # Version 4: Focus on dark text
-        gray = cv2.cvtColor(working_img, cv2.COLOR_BGR2GRAY)
-        
-        # Bilateral filter - preserves edges
-        bilateral = cv2.bilateralFilter(gray, 9, 75, 75)
-        preprocessed_images.append(("bilateral", bilateral))
-        
-        # Version 5: Otsu thresholding
-        _, otsu = cv2.threshold(bilateral, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        preprocessed_images.append(("otsu", otsu))
-        
-        # Version 6: Inverted Otsu (for light text on dark background)
-        _, otsu_inv = cv2.threshold(bilateral, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-        preprocessed_images.append(("otsu_inverted", otsu_inv))
-        
-        # Version 7: Morphological operations to clean up
-        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2,2))
-        morph = cv2.morphologyEx(otsu, cv2.MORPH_CLOSE, kernel)
-        preprocessed_images.append(("morphological", morph))
-        
-        return preprocessed_images
+        with metrics.timer('preprocess:lab_enhanced'):
+            lab = cv2.cvtColor(working_img, cv2.COLOR_BGR2LAB)
+            clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+            # `dst` doubles as the scratch plane for the equalised L channel
+            cl = clahe.apply(cv2.extractChannel(lab, 0), dst)
+            cv2.insertChannel(cl, lab, 0)
+            enhanced_bgr = cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+            del lab
+            return cv2.cvtColor(enhanced_bgr, cv2.COLOR_BGR2GRAY, dst=cl)
+    
+    def bilateral_filter(self, working_img):
+        """Version 4: Focus on dark text"""
+        with metrics.timer('preprocess:bilateral'):
+            gray = cv2.cvtColor(working_img, cv2.COLOR_BGR2GRAY)
+            
+            # Bilateral filter - preserves edges
+            return cv2.bilateralFilter(gray, 9, 75, 75)
+    
+    def otsu_threshold(self, bilateral, inverted=False, dst=None):
+        """Version 5: Otsu thresholding, or version 6 inverted (for light text on dark background)"""
+        with metrics.timer('preprocess:otsu_inverted' if inverted else 'preprocess:otsu'):
+            mode = cv2.THRESH_BINARY_INV if inverted else cv2.THRESH_BINARY
+            _, otsu = cv2.threshold(bilateral, 0, 255, mode + cv2.THRESH_OTSU, dst=dst)
+            return otsu
+    
+    def morphological_cleanup(self, bilateral, dst=None):
+        """Version 7: Morphological operations to clean up the Otsu image"""
+        otsu = self.otsu_threshold(bilateral, dst=dst)
+        with metrics.timer('preprocess:morphological'):
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2,2))
+            return cv2.morphologyEx(otsu, cv2.MORPH_CLOSE, kernel, dst=otsu)
     
     def is_valid_text(self, text):
         """Check if text is likely to be real readable text"""
-        if not text or len(text. strip()) < 2:
-            return False
-        
-        # Must have at least some letters
-        if not re.search(r'[A-Za-z]', text):
-            return False
-        
-        # Calculate ratio of alphanumeric to total
-        alphanumeric = sum(c.isalnum() for c in text)
-        total = len(text. replace(' ', ''))
-        
-        if total == 0:
-            return False
-        
-        ratio = alphanumeric / total
-        
-        # At least 70% should be alphanumeric
-        return ratio >= 0.7
+        return is_valid_text(text)
     
-    def extract_text_with_ocr(self, image_path):
+    def detect_text_regions(self, img):
+        """Run the text detector only, returning (horizontal_list, free_list)"""
+        with metrics.timer('detect'):
+            horizontal_list, free_list = self.reader.detect(img, **self.DETECT_PARAMS)
+        return horizontal_list[0], free_list[0]
+
+    def variant_frame(self, strategy, frames):
+        """Name of the frame (image geometry) a variant was derived from"""
+        # The variants after 'deskewed' are derived from the deskewed image,
+        # or its largest-text band in ROI mode, so at most three detector
+        # passes are needed per image.
+        if strategy in frames:
+            return strategy
+        for frame in ('band', 'deskewed'):
+            if frame in frames:
+                return frame
+        return 'original'
+
+    def variant_regions(self, strategy, img, frames, detections):
+        """Text regions to recognize for one variant"""
+        if not self.shared_detection:
+            return self.detect_text_regions(img)
+
+        frame = self.variant_frame(strategy, frames)
+        if frame not in detections:
+            detections[frame] = self.detect_text_regions(frames[frame][0])
+        return detections[frame]
+
+    def run_ocr(self, strategy, img, frames, detections):
+        """OCR one variant, reusing detected text regions when shared detection is on"""
+        if self._scheduler is not None:
+            # Detection stays in this thread; recognition joins a shared batch
+            with self._scheduler.slot() as submit:
+                horizontal_list, free_list = self.variant_regions(strategy, img, frames, detections)
+                if not horizontal_list and not free_list:
+                    return []
+                with metrics.timer(f'ocr:{strategy}'):
+                    return submit(img, horizontal_list, free_list)
+
+        if not self.shared_detection:
+            # Use paragraph=False for better individual text detection
+            with metrics.timer(f'ocr:{strategy}'):
+                return self.reader.readtext(img, paragraph=False, **self.DETECT_PARAMS)
+
+        horizontal_list, free_list = self.variant_regions(strategy, img, frames, detections)
+        if not horizontal_list and not free_list:
+            return []
+        with metrics.timer(f'ocr:{strategy}'):
+            return self.reader.recognize(
+                img,
+                horizontal_list=horizontal_list,
+                free_list=free_list,
+                paragraph=False
+            )
+
+    def ocr_wave(self, wave, source, detections):
+        """OCR a group of variants, concurrently when a thread pool is configured"""
+        frames = source.frames
+
+        def run(strategy):
+            img = None
+            try:
+                img = source.take(strategy)
+                return self.run_ocr(strategy, img, frames, detections)
+            except Exception as e:
+                return e
+            finally:
+                if img is not None:
+                    source.release(strategy, img)
+
+        if self._pool is None or len(wave) == 1:
+            return [run(strategy) for strategy in wave]
+
+        if self.shared_detection:
+            # Fill the detection cache up front so the OCR threads only read it
+            missing = {self.variant_frame(strategy, frames) for strategy in wave} - detections.keys()
+            futures = {
+                frame: self._pool.submit(contextvars.copy_context().run, self.detect_text_regions, frames[frame][0])
+                for frame in missing
+            }
+            for frame, future in futures.items():
+                try:
+                    detections[frame] = future.result()
+                except Exception:
+                    pass  # run() retries and reports the error per variant
+
+        # Each task runs in a copy of this context so its stage timings reach the request
+        futures = [self._pool.submit(contextvars.copy_context().run, run, strategy) for strategy in wave]
+        return [future.result() for future in futures]
+
+    def recognize_batch(self, jobs, batch_size=None):
+        """Recognize the text regions of many (image, horizontal_list, free_list) jobs in batched recognizer calls"""
+        from easyocr.config import imgH
+        from easyocr.recognition import get_text
+        from easyocr.utils import get_image_list, reformat_input
+
+        batch_size = batch_size or self.batch_size
+        crops = []
+        for job_idx, (img, horizontal_list, free_list) in enumerate(jobs):
+            if not horizontal_list and not free_list:
+                continue
+            _, img_cv_grey = reformat_input(img)
+            image_list, _ = get_image_list(horizontal_list, free_list, img_cv_grey, model_height=imgH)
+            for order, (box, crop) in enumerate(image_list):
+                crops.append((job_idx, order, box, crop))
+
+        results = [[] for _ in jobs]
+        if not crops:
+            return results
+
+        crops.sort(key=lambda c: c[3].shape[1])
+        ignore_char = ''.join(set(self.reader.character) - set(self.reader.lang_char))
+
+        for start in range(0, len(crops), batch_size):
+            chunk = crops[start:start + batch_size]
+            max_ratio = max(1, max(crop.shape[1] / crop.shape[0] for _, _, _, crop in chunk))
+            with metrics.timer('recognize_batch'):
+                predictions = get_text(
+                    self.reader.character, imgH, int(math.ceil(max_ratio) * imgH),
+                    self.reader.recognizer, self.reader.converter,
+                    [(box, crop) for _, _, box, crop in chunk],
+                    ignore_char=ignore_char,
+                    batch_size=len(chunk),
+                    workers=0,
+                    device=self.reader.device
+                )
+            for (job_idx, order, _, _), prediction in zip(chunk, predictions):
+                results[job_idx].append((order, prediction))
+
+        # Restore per-image reading order
+        return [[prediction for _, prediction in sorted(items, key=lambda x: x[0])] for items in results]
+
+    def collect_text_hits(self, results, strategy, all_results, frames=None):
+        """Append the valid OCR hits of one variant to all_results"""
+        transform = frames[self.variant_frame(strategy, frames)][1] if frames else None
+        for (bbox, text, confidence) in results:
+            # Only keep valid text
+            if self.is_valid_text(text):
+                all_results.append({
+                    'text': text. strip(),
+                    'confidence':  confidence,
+                    'bbox':  bbox if transform is None else map_bbox(bbox, transform),
+                    'strategy': strategy,
+                    'area': self.calculate_bbox_area(bbox)
+                })
+
+    def order_variants(self, strategies):
+        """Sort variant names by the configured cascade priority"""
+        def priority(strategy):
+            if strategy in self.variant_order:
+                return self.variant_order.index(strategy)
+            # Variants missing from the order list run last
+            return len(self.variant_order)
+
+        return sorted(strategies, key=priority)
+
+    def should_stop_cascade(self, all_results):
+        """Check whether the OCR results so far are good enough to stop"""
+        with metrics.timer('identify'):
+            candidates = self.identify_medicine_name(self.merge_text_results(all_results))
+        if not candidates:
+            return False
+
+        best = candidates[0]
+        if best.get('lexicon_distance') is not None and best['confidence'] >= self.LEXICON_EXIT_CONFIDENCE:
+            print(f"    ⏩ '{best['name']}' matched the medicine lexicon, skipping remaining variants")
+            return True
+
+        if best['score'] >= self.early_exit_score and best['confidence'] >= self.early_exit_confidence:
+            print(f"    ⏩ Confident match '{best['name']}' (score {best['score']}), skipping remaining variants")
+            return True
+
+        # A (possibly fuzzy) DB hit only counts for a confidently read name,
+        # like the score exit; otherwise the remaining variants may read it better
+        if (self._lexicon is None and self.safety_checker is not None and
+                best['confidence'] >= self.early_exit_confidence and
+                self.safety_checker.check_safety(best['name']).get('found')):
+            print(f"    ⏩ '{best['name']}' found in safety DB, skipping remaining variants")
+            return True
+
+        return False
+
+    def extract_text_with_ocr(self, image_path, stats=None):
         """Extract text using EasyOCR with multiple preprocessing strategies"""
-        print(f"📸 Processing image: {image_path}")
+        results_list = []
+        for progress in self.iter_text_with_ocr(image_path, stats=stats):
+            results_list = progress['results']
+        return results_list
+    
+    def iter_text_with_ocr(self, image_path, stats=None):
+        """Generator version of extract_text_with_ocr, yielding the merged hits after every wave of variants"""
+        print(f"📸 Processing image: {image_path if isinstance(image_path, str) else 'in-memory image'}")
         
-        # Preprocess image with multiple strategies
-        preprocessed_images = self.preprocess_image(image_path)
+        # Prepare the image; variants are rendered lazily, wave by wave
+        frames = {}
+        source = self.prepare_variants(image_path, frames=frames)
+        strategies = self.order_variants(source.strategies) if self.cascade else source.strategies
         
         all_results = []
+        variants_run = []
+        results_list = []
+        detections = {}
         
         # Perform OCR on each preprocessed version
-        print(f"🔍 Running AI text detection on {len(preprocessed_images)} image variants...")
+        print(f"🔍 Running AI text detection on {len(strategies)} image variants...")
         
-        for idx, (strategy, img) in enumerate(preprocessed_images):
-            print(f"  Processing variant {idx+1}/{len(preprocessed_images)}: {strategy}")
-            try:
-                # Use paragraph=False for better individual text detection
-                results = self.reader.readtext(
-                    img, 
-                    paragraph=False,
-                    text_threshold=0.6,  # Lower threshold for better detection
-                    low_text=0.3
-                )
-                
-                for (bbox, text, confidence) in results:
-                    # Only keep valid text
-                    if self.is_valid_text(text):
-                        all_results.append({
-                            'text': text. strip(),
-                            'confidence':  confidence,
-                            'bbox':  bbox,
-                            'strategy': strategy,
-                            'area': self.calculate_bbox_area(bbox)
-                        })
-            except Exception as e:
-                print(f"    ⚠️ Error with {strategy}: {e}")
-                continue
+        try:
+            # Variants run in waves of `parallelism`; the cascade checks between waves
+            for start in range(0, len(strategies), self.parallelism):
+                wave = strategies[start:start + self.parallelism]
+                for idx, strategy in enumerate(wave, start):
+                    print(f"  Processing variant {idx+1}/{len(strategies)}: {strategy}")
+                    variants_run.append(strategy)
+                    height, width = source.shape(strategy)
+                    metrics.inc('mediscan_ocr_pixels_total', height * width, strategy=strategy)
+
+                for strategy, results in zip(wave, self.ocr_wave(wave, source, detections)):
+                    if isinstance(results, Exception):
+                        print(f"    ⚠️ Error with {strategy}: {results}")
+                        continue
+                    self.collect_text_hits(results, strategy, all_results, frames)
+
+                results_list = self.merge_text_results(all_results)
+                yield {
+                    'results': results_list,
+                    'variants_run': list(variants_run),
+                    'variants_total': len(strategies)
+                }
+
+                if self.cascade and self.should_stop_cascade(all_results):
+                    break
+        finally:
+            source.close()
         
-        # Remove duplicates and keep highest confidence
-        unique_results = {}
+        if stats is not None:
+            stats['variants_run'] = variants_run
+            stats['variants_skipped'] = [s for s in strategies if s not in variants_run]
+        self.count_variants(strategies, variants_run)
+        metrics.inc('mediscan_text_elements_total', len(results_list))
+        
+        print(f"✅ Found {len(results_list)} unique text elements")
+    
+    def count_variants(self, strategies, variants_run):
+        """Record run / skipped variants of one image in the metrics counters"""
+        for strategy in strategies:
+            if strategy in variants_run:
+                metrics.inc('mediscan_variants_run_total', strategy=strategy)
+            else:
+                metrics.inc('mediscan_variants_skipped_total', strategy=strategy)
+
+    def merge_text_results(self, all_results):
+        """Deduplicate OCR hits across variants and sort them by position"""
+        hits = []
         for item in all_results:
             # Normalize text for comparison
             text_normalized = item['text'].strip().upper()
@@ -194,7 +897,22 @@ class MediScanExtractor:
             # Skip very short text
             if len(text_normalized) < 2:
                 continue
-            
+            hits.append((text_normalized, item))
+        
+        if len(hits) > 1:
+            # Axis-aligned extent of each (possibly rotated) 4-point box
+            points = np.array([item['bbox'] for _, item in hits], dtype=np.float64)
+            boxes = np.concatenate([points.min(axis=1), points.max(axis=1)], axis=1)
+            # Overlapping boxes are one text region read by several variants; keep its voted reading
+            labels = overlap_clusters(boxes, self.MERGE_IOU)
+            regions = {}
+            for label, hit in zip(labels, hits):
+                regions.setdefault(label, []).append(hit)
+            hits = [self.vote_region(region) for region in regions.values()]
+        
+        # Remove duplicates and keep highest confidence
+        unique_results = {}
+        for text_normalized, item in hits:
             # Keep the result with highest confidence for each unique text
             if text_normalized not in unique_results or unique_results[text_normalized]['confidence'] < item['confidence']:
                 unique_results[text_normalized] = item
@@ -216,10 +934,19 @@ class MediScanExtractor:
         # Sort by position (top to bottom, left to right)
         results_list.sort(key=lambda x: (x['position'][0], x['position'][1]))
         
-        print(f"✅ Found {len(results_list)} unique text elements")
-        
         return results_list
     
+    def vote_region(self, region):
+        """The (normalized text, hit) a text region's variants agree on"""
+        votes = {}
+        for text_normalized, item in region:
+            total, best = votes.get(text_normalized, (0.0, None))
+            if best is None or item['confidence'] > best['confidence']:
+                best = item
+            votes[text_normalized] = (total + item['confidence'], best)
+        text_normalized, (_, best) = max(votes.items(), key=lambda vote: (vote[1][0], vote[1][1]['confidence']))
+        return text_normalized, best
+    
     def calculate_bbox_area(self, bbox):
         """Calculate area of bounding box"""
         points = np.array(bbox)
@@ -231,14 +958,7 @@ class MediScanExtractor:
     
     def clean_medicine_name(self, text):
         """Clean up medicine name text"""
-        # Remove excessive special characters
-        cleaned = re.sub(r'[^\w\s\-/+()]', ' ', text)
-        # Remove extra spaces
-        cleaned = ' '.join(cleaned.split())
-        # Remove standalone numbers at the start/end
-        cleaned = re.sub(r'^\d+\s+', '', cleaned)
-        cleaned = re.sub(r'\s+\d+$', '', cleaned)
-        return cleaned.strip()
+        return clean_medicine_name(text)
     
     def identify_medicine_name(self, extracted_data):
         """
@@ -246,164 +966,57 @@ class MediScanExtractor:
         """
         if not extracted_data:
             return []
-        
-        candidates = []
-        
-        # Common non-medicine keywords to filter out
-        skip_patterns = [
-            r'^MRP\s*: ?\s*\d+',
-            r'BATCH\s*NO',
-            r'MFG\s*DATE',
-            r'EXP\s*DATE',
-            r'NET\s*QTY',
-            r'^\d+\s*ML$',
-            r'^\d+\s*MG$',
-            r'^\d+\s*TABLETS? $',
-            r'^\d+\s*CAPSULES?$',
-            r'^STRIP\s+OF',
-            r'^BLISTER\s+OF',
-            r'PVT\s*LTD',
-            r'PHARMA(CEUTICALS? )?$',
-            r'^IP\s*\d+',
-            r'^\d+\s*X\s*\d+',
-            r'^E\d+/\d+',  # Batch codes
-            r'^\d{3,}/\d+',  # Codes like 772/22226123
-            r'^[A-Z]\d+/\d+',  # Codes like R38/38628227
-        ]
-        
-        # Medicine name indicators
-        medicine_keywords = [
-            'TABLETS', 'CAPS', 'CAPSULES', 'SYRUP', 'SUSPENSION', 'INJECTION',
-            'HYDROCHLORIDE', 'SULPHATE', 'SULFATE', 'SODIUM', 'ACETATE',
-            'MG', 'MCG', 'ML', 'IP', 'BP', 'USP'
-        ]
-        
-        for idx, item in enumerate(extracted_data[: 25]):  # Check top 25 results
-            text = item['text']. strip()
-            text_upper = text.upper()
-            confidence = item['confidence']
-            position_score = 1.0 - (idx * 0.02)  # Slower decay
-            area = item. get('area', 0)
-            
-            # Skip very short text
-            if len(text) < 3:
-                continue
-            
-            # Skip if only numbers
-            if re.match(r'^\d+$', text):
-                continue
-            
-            # Skip using patterns
-            skip = False
-            for pattern in skip_patterns:
-                if re. search(pattern, text_upper):
-                    skip = True
-                    break
-            
-            if skip:
-                continue
-            
-            # Skip if mostly special characters
-            alpha_count = sum(c.isalpha() for c in text)
-            if alpha_count < 3:
-                continue
-            
-            # Calculate base score
-            score = confidence * 0.35 + position_score * 0.25
-            
-            # Bonus:  Larger text (brand names are usually larger)
-            if area > 0: 
-                # Normalize area bonus (max 0.15)
-                area_bonus = min(0.15, (area / 10000) * 0.05)
-                score += area_bonus
-            
-            # Bonus:  Top 3 positions
-            if idx < 3:
-                score += 0.20
-            
-            # Bonus:  Title case or all caps with good length
-            if (text. istitle() or text.isupper()) and 5 <= len(text) <= 30:
-                score += 0.15
-            
-            # Bonus:  Contains letters and numbers (like "Prolee-10", "Crocin-650")
-            if re.search(r'[A-Za-z]{4,}', text) and re.search(r'\d+', text):
-                score += 0.20
-            
-            # Bonus:  Contains hyphen with letters on both sides
-            if re.search(r'[A-Za-z]+-\d+', text):
-                score += 0.15
-            
-            # Bonus: Good length
-            if 5 <= len(text) <= 25:
-                score += 0.10
-            
-            # Bonus: High confidence from original or deskewed
-            if item. get('strategy') in ['original', 'deskewed'] and confidence > 0.75:
-                score += 0.15
-            
-            # Bonus:  Contains medicine-related keywords
-            if any(keyword in text_upper for keyword in medicine_keywords):
-                # Small bonus, as these could be in descriptions too
-                score += 0.05
-            
-            # Penalty:  Very long text (likely description)
-            if len(text) > 40:
-                score -= 0.20
-            
-            # Penalty:  Too many special characters
-            special_count = sum(not c.isalnum() and not c.isspace() for c in text)
-            if special_count > len(text) * 0.3:
-                score -= 0.15
-            
-            # Penalty:  Starts with numbers (likely codes)
-            if re.match(r'^\d', text):
-                score -= 0.10
-            
-            # Clean the medicine name
-            cleaned_name = self.clean_medicine_name(text)
-            
-            if not cleaned_name or len(cleaned_name) < 3:
-                continue
-            
-            candidates.append({
-                'name': cleaned_name,
-                'original_text': text,
-                'confidence': round(confidence * 100, 2),
-                'score': round(score, 3),
-                'position': idx + 1,
-                'strategy': item. get('strategy', 'unknown'),
-                'area': round(area, 2)
-            })
-        
-        # Sort by score
-        candidates.sort(key=lambda x: x['score'], reverse=True)
-        
-        # Filter out very low scoring candidates
-        candidates = [c for c in candidates if c['score'] > 0.40]
-        
-        return candidates
-    
-    def process_image(self, image_path):
-     """Main processing pipeline"""
-    
+        return self.snap_candidates([self.scorer.score(extracted_data)])[0]
+
+    def snap_candidates(self, batch):
+        """Snap the top candidates of each list in `batch` to the lexicon, in one lookup"""
+        if self._lexicon is None:
+            return batch
+        cfg = self.scorer.config
+        top = [candidate for candidates in batch for candidate in candidates[:cfg.lexicon_top_n]]
+        if not top:
+            return batch
+        with metrics.timer('lexicon'):
+            matches = self._lexicon.snap_batch([candidate['name'] for candidate in top])
+        for candidate, match in zip(top, matches):
+            candidate['lexicon_distance'] = None
+            if match is not None:
+                candidate['name'] = match['name']
+                candidate['lexicon_distance'] = match['distance']
+                candidate['score'] = round(candidate['score'] + cfg.lexicon_bonus, 3)
+        deduped = []
+        for candidates in batch:
+            candidates.sort(key=lambda x: x['score'], reverse=True)
+            # Two misreads of one name can snap to the same spelling
+            seen = set()
+            unique = []
+            for candidate in candidates:
+                key = normalize_name(candidate['name'])
+                if key not in seen:
+                    seen.add(key)
+                    unique.append(candidate)
+            deduped.append(unique)
+        return deduped
     
-     try:
-        # Extract all text
-        extracted_data = self.extract_text_with_ocr(image_path)
-        
+    def build_result(self, extracted_data, stats, medicine_candidates=None):
+        """Turn merged OCR hits into the JSON-ready extraction result"""
         if not extracted_data:
             return {
                 'success': False,
-                'error': 'No text detected in the image.  Please try a clearer image.'
+                'error': 'No text detected in the image.  Please try a clearer image.',
+                **stats
             }
         
         # Identify medicine names
-        medicine_candidates = self.identify_medicine_name(extracted_data)
+        if medicine_candidates is None:
+            with metrics.timer('identify'):
+                medicine_candidates = self.identify_medicine_name(extracted_data)
         
         if not medicine_candidates:  
             return {
                 'success': False,
-                'error': 'Could not identify medicine name. Please try a different image or angle.'
+                'error': 'Could not identify medicine name. Please try a different image or angle.',
+                **stats
             }
         
         # Get all extracted text for reference
@@ -421,7 +1034,9 @@ class MediScanExtractor:
             'confidence': float(medicine_candidates[0]['confidence']),
             'score': float(medicine_candidates[0]['score']),
             'position': int(medicine_candidates[0]['position']),
-            'strategy': str(medicine_candidates[0]. get('strategy', 'unknown'))
+            'strategy': str(medicine_candidates[0]. get('strategy', 'unknown')),
+            'bbox': self.format_bbox(medicine_candidates[0].get('bbox')),
+            'lexicon_distance': medicine_candidates[0].get('lexicon_distance')
         }
         
         # Convert all candidates
@@ -432,7 +1047,9 @@ class MediScanExtractor:
                 'confidence':  float(c['confidence']),
                 'score': float(c['score']),
                 'position':  int(c['position']),
-                'strategy': str(c. get('strategy', 'unknown'))
+                'strategy': str(c. get('strategy', 'unknown')),
+                'bbox': self.format_bbox(c.get('bbox')),
+                'lexicon_distance': c.get('lexicon_distance')
             })
         
         return {
@@ -440,8 +1057,25 @@ class MediScanExtractor:
             'best_match': best_match,
             'all_candidates': all_candidates,
             'all_text': all_text,
-            'total_text_found': len(all_text)
+            'total_text_found': len(all_text),
+            **stats
         }
+    
+    def format_bbox(self, bbox):
+        """JSON-ready [[x, y], ...] box in original-image pixels"""
+        if bbox is None:
+            return None
+        return [[round(float(x), 1), round(float(y), 1)] for x, y in bbox]
+    
+    def process_image(self, image_path):
+     """Main processing pipeline"""
+    
+    
+     try:
+        # Extract all text
+        stats = {}
+        extracted_data = self.extract_text_with_ocr(image_path, stats=stats)
+        return self.build_result(extracted_data, stats)
         
      except Exception as e: 
         import traceback
@@ -449,4 +1083,101 @@ class MediScanExtractor:
         return {
             'success': False,
             'error': f'Processing error: {str(e)}'
-        }
\ No newline at end of file
+        }
+    
+    def stream_image(self, image_path):
+        """Progressive version of process_image, yielding ('progress' | 'result', result) pairs"""
+        try:
+            stats = {}
+            extracted_data = []
+            for progress in self.iter_text_with_ocr(image_path, stats=stats):
+                extracted_data = progress['results']
+                partial = self.build_result(extracted_data, {
+                    'variants_done': len(progress['variants_run']),
+                    'variants_total': progress['variants_total']
+                })
+                yield 'progress', partial
+            yield 'result', self.build_result(extracted_data, stats)
+        
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield 'result', {
+                'success': False,
+                'error': f'Processing error: {str(e)}'
+            }
+    
+    def process_images(self, images):
+        """Batched pipeline over many images (file paths, encoded bytes or BGR arrays)"""
+        print(f"📦 Batch processing {len(images)} images...")
+        
+        states = []
+        for image in images:
+            state = {'error': None, 'source': None, 'variants': [], 'all_results': [], 'variants_run': [], 'detections': {}, 'done': False}
+            try:
+                state['frames'] = {}
+                state['source'] = self.prepare_variants(image, frames=state['frames'])
+                strategies = state['source'].strategies
+                state['variants'] = self.order_variants(strategies) if self.cascade else strategies
+            except Exception as e:
+                state['error'] = f'Processing error: {str(e)}'
+            states.append(state)
+        
+        rounds = max((len(state['variants']) for state in states), default=0)
+        try:
+            for k in range(rounds):
+                jobs, owners = [], []
+                for state in states:
+                    if state['error'] or state['done'] or k >= len(state['variants']):
+                        continue
+                    strategy = state['variants'][k]
+                    img = None
+                    try:
+                        # Rendered for this round only; the buffer goes back after recognition
+                        img = state['source'].take(strategy)
+                        horizontal_list, free_list = self.variant_regions(strategy, img, state['frames'], state['detections'])
+                    except Exception as e:
+                        print(f"    ⚠️ Error with {strategy}: {e}")
+                        if img is not None:
+                            state['source'].release(strategy, img)
+                        continue
+                    state['variants_run'].append(strategy)
+                    metrics.inc('mediscan_ocr_pixels_total', img.shape[0] * img.shape[1], strategy=strategy)
+                    jobs.append((img, horizontal_list, free_list))
+                    owners.append((state, strategy))
+                
+                if not jobs:
+                    continue
+                print(f"  Round {k+1}/{rounds}: recognizing {len(jobs)} variants")
+                for (state, strategy), (img, _, _), results in zip(owners, jobs, self.recognize_batch(jobs)):
+                    state['source'].release(strategy, img)
+                    self.collect_text_hits(results, strategy, state['all_results'], state['frames'])
+                    if self.cascade and self.should_stop_cascade(state['all_results']):
+                        state['done'] = True
+        finally:
+            for state in states:
+                if state['source'] is not None:
+                    state['source'].close()
+        
+        merged = [self.merge_text_results(state['all_results']) for state in states]
+        # Candidates of the whole batch are scored in one pass
+        with metrics.timer('identify'):
+            batch_candidates = self.snap_candidates(self.scorer.score_batch(merged))
+        
+        output = []
+        for state, extracted_data, candidates in zip(states, merged, batch_candidates):
+            if state['error']:
+                output.append({'success': False, 'error': state['error']})
+                continue
+            try:
+                stats = {
+                    'variants_run': state['variants_run'],
+                    'variants_skipped': [s for s in state['variants'] if s not in state['variants_run']]
+                }
+                self.count_variants(state['variants'], state['variants_run'])
+                metrics.inc('mediscan_text_elements_total', len(extracted_data))
+                output.append(self.build_result(extracted_data, stats, medicine_candidates=candidates))
+            except Exception as e:
+                output.append({'success': False, 'error': f'Processing error: {str(e)}'})
+        
+        return output
@@ -0,0 +1,171 @@
+import bisect
+import functools
+import hashlib
+from medicine_safety import normalize_name
+from metrics import metrics
+
+# Shortest key (in characters) allowed one / two edits; shorter keys must
+# match exactly, since a single edit turns most 4-letter words into others
+ONE_EDIT_LENGTH = 5
+TWO_EDIT_LENGTH = 9
+# Word spans shorter than this are never snapped on their own
+MIN_SPAN_LENGTH = 4
+
+SNAP_CACHE_SIZE = 4096
+
+
+def max_edits(length):
+    """Edit distance budget for a key of `length` characters"""
+    if length >= TWO_EDIT_LENGTH:
+        return 2
+    if length >= ONE_EDIT_LENGTH:
+        return 1
+    return 0
+
+
+class MedicineLexicon:
+    """Known medicine names, searched as a prefix trie for OCR snapping
+
+    The sorted keys are the trie: a node is the (lo, hi, depth) slice of
+    the names sharing its prefix.
+    """
+
+    def __init__(self, names):
+        # The first spelling wins for duplicate normalized names
+        unique = {}
+        for name in names:
+            key = normalize_name(name)
+            if key:
+                unique.setdefault(key, str(name).strip())
+        self.keys = sorted(unique)
+        self.names = [unique[key] for key in self.keys]
+        self.max_length = max(map(len, self.keys), default=0)
+        self.digest = hashlib.sha256('\n'.join(self.names).encode('utf-8')).hexdigest()[:16]
+        self.snap = functools.lru_cache(maxsize=SNAP_CACHE_SIZE)(self._snap)
+
+    @classmethod
+    def from_file(cls, path):
+        """One name per line; blank lines and '#' comments are skipped"""
+        with open(path, encoding='utf-8') as f:
+            names = [line.strip() for line in f]
+        return cls(name for name in names if name and not name.startswith('#'))
+
+    @classmethod
+    def from_table(cls, table):
+        """The names of a medicine_safety.SafetyTable"""
+        return cls(table.medicine_name(idx) for idx in range(len(table)))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def find(self, key):
+        """Index of an exact normalized name, or None"""
+        idx = bisect.bisect_left(self.keys, key)
+        if idx < len(self.keys) and self.keys[idx] == key:
+            return idx
+        return None
+
+    def nearest(self, key, edits):
+        """(distance, index) of the closest name within `edits` edits of key, or None"""
+        idx = self.find(key)
+        if idx is not None:
+            return 0, idx
+        if edits <= 0 or not self.keys:
+            return None
+
+        keys = self.keys
+        n = len(key)
+        # Cells further than `edits` off the diagonal can never be within
+        # budget, so each row only computes its band; the rest stay above it
+        over = edits + 1
+        best_distance, best_idx = over, None
+        stack = [(0, len(keys), 0, list(range(min(n, edits) + 1)) + [over] * (n - min(n, edits)))]
+        while stack:
+            lo, hi, depth, row = stack.pop()
+            # The prefix itself, if it is a name, sorts first in its slice
+            if len(keys[lo]) == depth:
+                if row[n] < best_distance:
+                    best_distance, best_idx = row[n], lo
+                lo += 1
+            band_lo = max(1, depth + 1 - edits)
+            band_hi = min(n, depth + 1 + edits)
+            children = []
+            while lo < hi:
+                char = keys[lo][depth]
+                end = bisect.bisect_left(keys, keys[lo][:depth] + chr(ord(char) + 1), lo, hi)
+                child = [over] * (n + 1)
+                child[0] = min(depth + 1, over)
+                for i in range(band_lo, band_hi + 1):
+                    child[i] = min(child[i - 1] + 1, row[i] + 1, row[i - 1] + (key[i - 1] != char), over)
+                if min(child[band_lo - 1:band_hi + 1]) < best_distance:
+                    children.append((depth < n and char == key[depth], (lo, end, depth + 1, child)))
+                lo = end
+            # The child that follows the key is explored first (pushed last),
+            # so a close match is found early and tightens the pruning
+            children.sort(key=lambda child: child[0])
+            stack.extend(node for _, node in children)
+        if best_idx is None:
+            return None
+        return best_distance, best_idx
+
+    def _snap(self, text):
+        """{'name', 'distance', 'similarity'} of the known name closest to the text or its longest matching word run, or None"""
+        words = normalize_name(text).split()
+        for size in range(len(words), 0, -1):
+            best = None
+            for start in range(len(words) - size + 1):
+                key = ' '.join(words[start:start + size])
+                if not MIN_SPAN_LENGTH <= len(key) <= self.max_length + max_edits(len(key)):
+                    continue
+                found = self.nearest(key, max_edits(len(key)))
+                if found is not None and (best is None or found[0] < best[0][0]):
+                    best = (found, key)
+            if best is not None:
+                (distance, idx), key = best
+                return {
+                    'name': self.names[idx],
+                    'distance': distance,
+                    'similarity': round(1.0 - distance / max(len(key), len(self.keys[idx])), 3),
+                }
+        return None
+
+    def snap_batch(self, texts):
+        """snap() of every text, each distinct text searched once"""
+        unique = {text: self.snap(text) for text in dict.fromkeys(texts)}
+        for match in unique.values():
+            outcome = 'miss' if match is None else 'exact' if match['distance'] == 0 else 'fuzzy'
+            metrics.inc('mediscan_lexicon_snaps_total', match=outcome)
+        return [unique[text] for text in texts]
+
+
+class SafetyDBLexicon:
+    """MedicineLexicon of a MedicineSafetyChecker's names, rebuilt by its reload() before the swap"""
+
+    def __init__(self, safety_checker):
+        self.safety_checker = safety_checker
+        self._lexicon = MedicineLexicon.from_table(safety_checker.table)
+        safety_checker.on_reload(self._rebuild)
+
+    def _rebuild(self, table):
+        self._lexicon = MedicineLexicon.from_table(table)
+
+    def current(self):
+        return self._lexicon
+
+    def __len__(self):
+        return len(self.current())
+
+    def snap(self, text):
+        return self.current().snap(text)
+
+    def snap_batch(self, texts):
+        return self.current().snap_batch(texts)
+
+
+def load_lexicon(source, safety_checker=None):
+    """Lexicon for an extractor's `lexicon` setting: 'safety_db' or a names file path"""
+    if source == 'safety_db':
+        if safety_checker is None:
+            raise ValueError("lexicon='safety_db' needs a safety_checker")
+        return SafetyDBLexicon(safety_checker)
+    return MedicineLexicon.from_file(source)
@@ -1,72 +1,407 @@
-import pandas as pd
-from difflib import get_close_matches
+import argparse
+import csv
+import functools
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import numpy as np
+from difflib import SequenceMatcher
+from metrics import metrics
+
+# --------------------
+# Compiled DB format
+# --------------------
+# Header, then 8-byte aligned sections:
+#   float64 columns (FLOAT_COLUMNS order), int32 interaction_count,
+#   uint32 string offsets (4 per row: name_lower, medicine_name, label,
+#   ingredients), uint32 trigram offsets, uint32 posting offsets,
+#   uint32 postings, UTF-8 string blob, UTF-8 trigram blob.
+# Rows are sorted by the UTF-8 bytes of the normalized name and trigrams by
+# their UTF-8 bytes, so both are binary-searchable straight from the mmap.
+MAGIC = b'MSDB'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sIIIIII')
+
+FLOAT_COLUMNS = [
+    'avg_daily_dosage_mg', 'side_effect_score', 'toxicity_index',
+    'graph_degree_centrality', 'graph_clustering_coeff'
+]
+STRING_FIELDS = ['name_lower', 'medicine_name', 'label', 'ingredients']
+
+
+def normalize_name(name):
+    return str(name).strip().lower()
+
+
+def trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+def compile_rows(rows):
+    """Build the compiled DB image (bytes) from CSV row dicts"""
+    # The first row wins for duplicate names, as with the old CSV lookup
+    unique = {}
+    for row in rows:
+        unique.setdefault(normalize_name(row['medicine_name']), row)
+    keys = sorted(unique, key=lambda name: name.encode('utf-8'))
+    ordered = [unique[name] for name in keys]
+
+    strings = bytearray()
+    string_offsets = [0]
+    for name, row in zip(keys, ordered):
+        for field in (name, row['medicine_name'], row['label'], row['ingredients']):
+            strings += str(field).encode('utf-8')
+            string_offsets.append(len(strings))
+
+    postings_by_gram = {}
+    for idx, name in enumerate(keys):
+        for gram in trigrams(name):
+            postings_by_gram.setdefault(gram.encode('utf-8'), []).append(idx)
+    gram_keys = sorted(postings_by_gram)
+    gram_blob = b''.join(gram_keys)
+    gram_offsets = np.cumsum([0] + [len(g) for g in gram_keys])
+    posting_offsets = np.cumsum([0] + [len(postings_by_gram[g]) for g in gram_keys])
+    postings = [idx for g in gram_keys for idx in postings_by_gram[g]]
+
+    sections = [np.array([float(row[col]) for row in ordered], dtype='<f8') for col in FLOAT_COLUMNS]
+    sections += [
+        np.array([int(float(row['interaction_count'])) for row in ordered], dtype='<i4'),
+        np.array(string_offsets, dtype='<u4'),
+        np.array(gram_offsets, dtype='<u4'),
+        np.array(posting_offsets, dtype='<u4'),
+        np.array(postings, dtype='<u4'),
+    ]
+
+    out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, len(keys), len(gram_keys),
+                                 len(postings), len(strings), len(gram_blob)))
+    for section in sections:
+        out += b'\0' * (_align(len(out)) - len(out))
+        out += section.tobytes()
+    out += b'\0' * (_align(len(out)) - len(out))
+    out += strings
+    out += gram_blob
+    return bytes(out)
+
+
+def read_csv_rows(filepath):
+    with open(filepath, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+    # Debug (unchanged / optional)
+    print("Loaded columns:", reader.fieldnames)
+    return rows
+
+
+def build_compiled_db(csv_path, out_path):
+    """Convert the safety CSV into the compiled, memory-mappable format"""
+    image = compile_rows(read_csv_rows(csv_path))
+    with open(out_path, 'wb') as f:
+        f.write(image)
+    return len(image)
+
+
+class SafetyTable:
+    """Read-only columnar view over a compiled DB image"""
+
+    def __init__(self, buffer):
+        (magic, version, self.n_rows, n_grams, n_postings,
+         string_bytes, gram_bytes) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a compiled medicine safety DB")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported safety DB format version {version}")
+
+        self.buffer = buffer
+        offset = _align(HEADER.size)
+
+        def take(dtype, count):
+            nonlocal offset
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=offset)
+            offset = _align(offset + array.nbytes)
+            return array
+
+        self.float_columns = {col: take('<f8', self.n_rows) for col in FLOAT_COLUMNS}
+        self.interaction_count = take('<i4', self.n_rows)
+        self.string_offsets = take('<u4', len(STRING_FIELDS) * self.n_rows + 1)
+        self.gram_offsets = take('<u4', n_grams + 1)
+        self.posting_offsets = take('<u4', n_grams + 1)
+        self.postings = take('<u4', n_postings)
+        self.strings_start = offset
+        self.grams_start = offset + string_bytes
+        self.n_grams = n_grams
+
+    def __len__(self):
+        return self.n_rows
+
+    def _raw_string(self, idx, field):
+        k = idx * len(STRING_FIELDS) + field
+        start = self.strings_start + int(self.string_offsets[k])
+        end = self.strings_start + int(self.string_offsets[k + 1])
+        return bytes(self.buffer[start:end])
+
+    def name(self, idx):
+        """Normalized (lowercase) name of row idx"""
+        return self._raw_string(idx, 0).decode('utf-8')
+
+    def medicine_name(self, idx):
+        """Name of row idx as spelled in the source CSV"""
+        return self._raw_string(idx, 1).decode('utf-8')
+
+    def find(self, name):
+        """Row index of an exact normalized name, or None (binary search)"""
+        key = name.encode('utf-8')
+        lo, hi = 0, self.n_rows
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._raw_string(mid, 0) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_rows and self._raw_string(lo, 0) == key:
+            return lo
+        return None
+
+    def gram_postings(self, gram):
+        """Row indices whose name contains the trigram"""
+        key = gram.encode('utf-8')
+        lo, hi = 0, self.n_grams
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = self.grams_start + int(self.gram_offsets[mid])
+            end = self.grams_start + int(self.gram_offsets[mid + 1])
+            if bytes(self.buffer[start:end]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.n_grams:
+            start = self.grams_start + int(self.gram_offsets[lo])
+            end = self.grams_start + int(self.gram_offsets[lo + 1])
+            if bytes(self.buffer[start:end]) == key:
+                return self.postings[self.posting_offsets[lo]:self.posting_offsets[lo + 1]]
+        return self.postings[:0]
+
+    def label(self, idx):
+        """'banned' / 'safe' label of row idx"""
+        return self._raw_string(idx, 2).decode('utf-8')
+
+    def record(self, idx):
+        """check_safety result dict for row idx"""
+        return {
+            'found': True,
+            'medicine_name': self._raw_string(idx, 1).decode('utf-8'),
+            'label': self._raw_string(idx, 2).decode('utf-8'),
+            'ingredients': self._raw_string(idx, 3).decode('utf-8'),
+
+            # 🔹 ADDED ONLY (synthetic features)
+            'avg_daily_dosage_mg': float(self.float_columns['avg_daily_dosage_mg'][idx]),
+            'side_effect_score': float(self.float_columns['side_effect_score'][idx]),
+            'toxicity_index': float(self.float_columns['toxicity_index'][idx]),
+            'interaction_count': int(self.interaction_count[idx]),
+            'graph_degree_centrality': float(self.float_columns['graph_degree_centrality'][idx]),
+            'graph_clustering_coeff': float(self.float_columns['graph_clustering_coeff'][idx]),
+        }
+
+
+def load_table(filepath):
+    """Open a compiled DB with mmap, or compile a CSV in memory"""
+    with open(filepath, 'rb') as f:
+        is_compiled = f.read(len(MAGIC)) == MAGIC
+        if is_compiled:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if is_compiled:
+        table = SafetyTable(buffer)
+        print(f"Memory-mapped compiled safety DB: {len(table)} medicines")
+        return table
+    return SafetyTable(compile_rows(read_csv_rows(filepath)))
+
+
+class _Snapshot:
+    """One loaded version of the safety DB together with its lookup cache"""
+
+    def __init__(self, table, resolve, cache_size, mtime, version):
+        self.table = table
+        self.mtime = mtime
+        self.version = version
+        self.loaded_at = time.time()
+        # Caches the resolved (row index, match type) per normalized name
+        self.lookup = functools.lru_cache(maxsize=cache_size)(functools.partial(resolve, table))
+
+    @functools.cached_property
+    def digest(self):
+        """Content hash of the table, computed on first use (reads the whole mapping)"""
+        return hashlib.sha256(self.table.buffer).hexdigest()[:16]
+
 
 class MedicineSafetyChecker:
-    def __init__(self, filepath='medicine_safety.csv'):
-        # Load CSV (unchanged)
-        self.df = pd.read_csv(filepath)
+    # Fuzzy matching cutoff (same as the difflib.get_close_matches call it replaces)
+    FUZZY_CUTOFF = 0.7
+    # Names sharing the most trigrams with the query that get verified with
+    # SequenceMatcher; smaller databases are simply verified in full
+    FUZZY_MAX_CANDIDATES = 50
+
+    def __init__(self, filepath='medicine_safety.csv', cache_size=4096):
+        """Load the safety DB from the CSV or from a compiled .msdb file"""
+        self.filepath = filepath
+        self.cache_size = cache_size
+        self._reload_lock = threading.Lock()
+        self._watcher = None
+        self._stop_watching = threading.Event()
+        self._reload_listeners = []
+        self._state = self._load_snapshot(version=1)
+
+    @property
+    def table(self):
+        return self._state.table
+
+    @property
+    def digest(self):
+        """Content hash of the loaded DB version"""
+        return self._state.digest
+
+    def _load_snapshot(self, version):
+        # A compiled file stays mapped until the next swap: replace it
+        # atomically (write elsewhere, then rename), never in place
+        mtime = os.stat(self.filepath).st_mtime
+        table = load_table(self.filepath)
+        return _Snapshot(table, self._resolve, self.cache_size, mtime, version)
+
+    def reload(self):
+        """Rebuild the lookup structures from the source file and swap them in"""
+        with self._reload_lock:
+            started = time.time()
+            snapshot = self._load_snapshot(version=self._state.version + 1)
+            # Structures derived from the table are rebuilt before the swap
+            for callback in self._reload_listeners:
+                callback(snapshot.table)
+            # Single reference assignment: in-flight lookups keep the old snapshot
+            self._state = snapshot
+            print(f"🔄 Safety DB reloaded: {len(snapshot.table)} medicines "
+                  f"(v{snapshot.version}, {time.time() - started:.2f}s)")
+            return self.info()
+
+    def on_reload(self, callback):
+        """Call callback(table) with every reloaded table, before it is swapped in"""
+        self._reload_listeners.append(callback)
+
+    def start_watching(self, interval=5.0):
+        """Poll the source file and reload in a background thread when it changes"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        # A fresh event: the parent's watcher may have held the old one's lock at the fork
+        self._stop_watching = threading.Event()
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                try:
+                    if os.stat(self.filepath).st_mtime != self._state.mtime:
+                        self.reload()
+                except Exception as e:
+                    # Keep serving the current snapshot until a reload succeeds
+                    print(f"⚠️ Safety DB reload failed: {e}")
+
+        self._watcher = threading.Thread(target=watch, name='safety-db-watcher', daemon=True)
+        self._watcher.start()
 
-        # Debug (unchanged / optional)
-        print("Loaded columns:", self.df.columns.tolist())
+    def stop_watching(self):
+        if self._watcher is not None:
+            self._stop_watching.set()
+            self._watcher.join()
+            self._watcher = None
 
-        # Normalized name column (unchanged)
-        self.df['medicine_name_lower'] = (
-            self.df['medicine_name']
-            .astype(str)
-            .str.lower()
-            .str.strip()
-        )
+    def info(self):
+        """Source, version and cache statistics of the current snapshot"""
+        state = self._state
+        cache = state.lookup.cache_info()
+        return {
+            'source': self.filepath,
+            'medicines': len(state.table),
+            'version': state.version,
+            'loaded_at': state.loaded_at,
+            'watching': self._watcher is not None and self._watcher.is_alive(),
+            'cache_hits': cache.hits,
+            'cache_misses': cache.misses,
+            'cache_entries': cache.currsize,
+        }
+
+    def _fuzzy_candidates(self, table, name):
+        """Indices of names worth verifying for a fuzzy match"""
+        n_rows = len(table)
+        if n_rows <= self.FUZZY_MAX_CANDIDATES:
+            return range(n_rows)
+
+        postings = [table.gram_postings(gram) for gram in trigrams(name)]
+        if not postings:
+            return []
+        # Shared-trigram counts in one bincount (a posting list holds each
+        # row once), then read back for just the rows that occur
+        rows = np.concatenate(postings)
+        if not len(rows):
+            return []
+        row_counts = np.bincount(rows, minlength=n_rows)[rows]
+
+        # Counts are small integers, so the top rows are taken by threshold
+        # instead of a partial sort: every row above the threshold count,
+        # then rows at it until FUZZY_MAX_CANDIDATES. A row with count c
+        # occurs c times in `rows`.
+        occurrences = np.bincount(row_counts)
+        per_count = occurrences // np.maximum(np.arange(len(occurrences)), 1)
+        at_least = np.cumsum(per_count[::-1])[::-1]
+        enough = np.flatnonzero(at_least[1:] >= self.FUZZY_MAX_CANDIDATES)
+        threshold = int(enough[-1]) + 1 if len(enough) else 1
+        top = np.unique(rows[row_counts > threshold])
+        needed = self.FUZZY_MAX_CANDIDATES - len(top)
+        # The first needed * threshold tie occurrences hold >= needed distinct rows
+        ties = np.unique(rows[row_counts == threshold][:needed * threshold])[:needed]
+        return [int(idx) for idx in np.concatenate([top, ties])]
+
+    def _fuzzy_lookup(self, table, name):
+        """Best name with similarity >= FUZZY_CUTOFF (get_close_matches semantics)"""
+        matcher = SequenceMatcher()
+        matcher.set_seq2(name)
+        best = None
+        for idx in self._fuzzy_candidates(table, name):
+            candidate = table.name(idx)
+            matcher.set_seq1(candidate)
+            # The quick ratios bound ratio() from above, so candidates that
+            # cannot reach the best score so far skip the full comparison
+            bound = self.FUZZY_CUTOFF if best is None else best[0]
+            if matcher.real_quick_ratio() >= bound and matcher.quick_ratio() >= bound:
+                score = matcher.ratio()
+                # Ties go to the larger string, like heapq.nlargest in difflib
+                if score >= self.FUZZY_CUTOFF and (best is None or (score, candidate) > best[:2]):
+                    best = (score, candidate, idx)
+        return None if best is None else best[2]
+
+    def _resolve(self, table, name):
+        """(row index, 'exact' | 'fuzzy') for a normalized name, or (None, 'miss')"""
+        idx = table.find(name)
+        if idx is not None:
+            return idx, 'exact'
+        idx = self._fuzzy_lookup(table, name)
+        return idx, 'fuzzy' if idx is not None else 'miss'
 
     def check_safety(self, extracted_name):
-        name = extracted_name.strip().lower()
+        name = normalize_name(extracted_name)
+        # Read the snapshot once so the whole lookup uses one table
+        state = self._state
 
         # --------------------
-        # Exact match
+        # Exact match, then fuzzy match (cached per snapshot)
         # --------------------
-        row_df = self.df[self.df['medicine_name_lower'] == name]
-        if not row_df.empty:
-            row = row_df.iloc[0]
-            return {
-                'found': True,
-                'medicine_name': row['medicine_name'],
-                'label': row['label'],
-                'ingredients': row['ingredients'],
-
-                # 🔹 ADDED ONLY (synthetic features)
-                'avg_daily_dosage_mg': float(row['avg_daily_dosage_mg']),
-                'side_effect_score': float(row['side_effect_score']),
-                'toxicity_index': float(row['toxicity_index']),
-                'interaction_count': int(row['interaction_count']),
-                'graph_degree_centrality': float(row['graph_degree_centrality']),
-                'graph_clustering_coeff': float(row['graph_clustering_coeff']),
-            }
+        with metrics.timer('check_safety'):
+            idx, match = state.lookup(name)
+        metrics.inc('mediscan_safety_lookups_total', match=match)
 
-        # --------------------
-        # Fuzzy match
-        # --------------------
-        candidates = get_close_matches(
-            name,
-            self.df['medicine_name_lower'].tolist(),
-            n=1,
-            cutoff=0.7
-        )
-
-        if candidates:
-            row = self.df[self.df['medicine_name_lower'] == candidates[0]].iloc[0]
-            return {
-                'found': True,
-                'medicine_name': row['medicine_name'],
-                'label': row['label'],
-                'ingredients': row['ingredients'],
-
-                # 🔹 ADDED ONLY (synthetic features)
-                'avg_daily_dosage_mg': float(row['avg_daily_dosage_mg']),
-                'side_effect_score': float(row['side_effect_score']),
-                'toxicity_index': float(row['toxicity_index']),
-                'interaction_count': int(row['interaction_count']),
-                'graph_degree_centrality': float(row['graph_degree_centrality']),
-                'graph_clustering_coeff': float(row['graph_clustering_coeff']),
-            }
+        if idx is not None:
+            return state.table.record(idx)
 
         # --------------------
         # Not found
@@ -74,3 +409,62 @@ class MedicineSafetyChecker:
         return {
             'found': False
         }
+
+    def check_safety_batch(self, names):
+        """check_safety for a list of names plus their aggregate risk: {'results': [...], 'summary': {...}}"""
+        state = self._state
+        table = state.table
+        keys = [normalize_name(name) for name in names]
+
+        with metrics.timer('check_safety_batch'):
+            resolved = {key: state.lookup(key) for key in dict.fromkeys(keys)}
+        for _, match in resolved.values():
+            metrics.inc('mediscan_safety_lookups_total', match=match)
+
+        results = []
+        for name, key in zip(names, keys):
+            idx, match = resolved[key]
+            record = table.record(idx) if idx is not None else {'found': False}
+            results.append({'query': name, 'match': match, **record})
+
+        rows = np.array([resolved[key][0] for key in keys if resolved[key][0] is not None], dtype=np.int64)
+        # One row resolved from several entries is the same medicine prescribed twice
+        unique_rows, counts = np.unique(rows, return_counts=True)
+        summary = {
+            'medicines': len(names),
+            'found': len(rows),
+            'not_found': [result['query'] for result in results if not result['found']],
+            'max_toxicity_index': None,
+            'max_toxicity_medicine': None,
+            'total_side_effect_score': 0.0,
+            'total_interaction_count': 0,
+            'banned_any': False,
+            'banned': [],
+            'duplicates': [table.medicine_name(int(idx)) for idx in unique_rows[counts > 1]],
+        }
+        if len(rows):
+            toxicity = table.float_columns['toxicity_index'][rows]
+            worst = int(np.argmax(toxicity))
+            banned = [table.medicine_name(int(idx)) for idx in unique_rows if table.label(int(idx)) == 'banned']
+            summary.update({
+                'max_toxicity_index': float(toxicity[worst]),
+                'max_toxicity_medicine': table.medicine_name(int(rows[worst])),
+                'total_side_effect_score': round(float(table.float_columns['side_effect_score'][rows].sum()), 4),
+                'total_interaction_count': int(table.interaction_count[rows].sum()),
+                'banned_any': bool(banned),
+                'banned': banned,
+            })
+        return {'results': results, 'summary': summary}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Medicine safety DB tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="Compile the safety CSV into a memory-mappable .msdb file")
+    build.add_argument('csv_path')
+    build.add_argument('out_path')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        size = build_compiled_db(args.csv_path, args.out_path)
+        print(f"✅ Wrote {args.out_path} ({size} bytes)")
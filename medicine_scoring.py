@@ -0,0 +1,237 @@
+import functools
+import re
+import numpy as np
+
+# Common non-medicine keywords to filter out
+SKIP_PATTERNS = [
+    r'^MRP\s*: ?\s*\d+',
+    r'BATCH\s*NO',
+    r'MFG\s*DATE',
+    r'EXP\s*DATE',
+    r'NET\s*QTY',
+    r'^\d+\s*ML$',
+    r'^\d+\s*MG$',
+    r'^\d+\s*TABLETS? $',
+    r'^\d+\s*CAPSULES?$',
+    r'^STRIP\s+OF',
+    r'^BLISTER\s+OF',
+    r'PVT\s*LTD',
+    r'PHARMA(CEUTICALS? )?$',
+    r'^IP\s*\d+',
+    r'^\d+\s*X\s*\d+',
+    r'^E\d+/\d+',  # Batch codes
+    r'^\d{3,}/\d+',  # Codes like 772/22226123
+    r'^[A-Z]\d+/\d+',  # Codes like R38/38628227
+]
+
+# Medicine name indicators
+MEDICINE_KEYWORDS = [
+    'TABLETS', 'CAPS', 'CAPSULES', 'SYRUP', 'SUSPENSION', 'INJECTION',
+    'HYDROCHLORIDE', 'SULPHATE', 'SULFATE', 'SODIUM', 'ACETATE',
+    'MG', 'MCG', 'ML', 'IP', 'BP', 'USP'
+]
+
+# One search over the alternation == any pattern matching on its own
+SKIP_RE = re.compile('|'.join(f'(?:{pattern})' for pattern in SKIP_PATTERNS))
+KEYWORD_RE = re.compile('|'.join(re.escape(keyword) for keyword in MEDICINE_KEYWORDS))
+DIGITS_ONLY_RE = re.compile(r'^\d+$')
+HAS_LETTER_RE = re.compile(r'[A-Za-z]')
+LETTER_RUN_RE = re.compile(r'[A-Za-z]{4,}')
+DIGIT_RE = re.compile(r'\d+')
+HYPHEN_CODE_RE = re.compile(r'[A-Za-z]+-\d+')
+LEADING_DIGIT_RE = re.compile(r'^\d')
+SPECIAL_CHARS_RE = re.compile(r'[^\w\s\-/+()]')
+LEADING_NUMBER_RE = re.compile(r'^\d+\s+')
+TRAILING_NUMBER_RE = re.compile(r'\s+\d+$')
+
+# Columns of the per-text feature matrix, in the order their bonuses and
+# penalties are applied
+FEATURES = ['case', 'alnum', 'hyphen_code', 'length', 'keyword', 'too_long', 'special', 'leading_digit']
+
+FEATURE_CACHE_SIZE = 8192
+
+
+class ScoringConfig:
+    """Weights and thresholds of the medicine name scoring
+
+    The defaults are the original hand-tuned heuristics; pass keyword
+    overrides to tune them, e.g. ScoringConfig(top_position_bonus=0.3).
+    """
+    confidence_weight = 0.35
+    position_weight = 0.25
+    position_decay = 0.02  # per position, slow decay
+    area_bonus_max = 0.15
+    area_bonus_per_10k = 0.05  # per 10000 px² of text box (brand names are larger)
+    top_positions = 3
+    top_position_bonus = 0.20
+    case_bonus = 0.15  # title case or all caps with 5-30 chars
+    alnum_bonus = 0.20  # letters and numbers, like "Crocin-650"
+    hyphen_code_bonus = 0.15
+    length_bonus = 0.10  # 5-25 chars
+    strategy_bonus = 0.15  # confident hit from an unbinarised variant
+    strategy_bonus_min_confidence = 0.75
+    bonus_strategies = ('original', 'deskewed')
+    keyword_bonus = 0.05  # small, as keywords could be in descriptions too
+    long_text_penalty = 0.20  # over 40 chars, likely description
+    special_char_penalty = 0.15  # over 30% special characters
+    leading_digit_penalty = 0.10  # likely codes
+    lexicon_bonus = 0.30  # snapped to a known medicine name (with a lexicon)
+    lexicon_top_n = 5  # best candidates checked against the lexicon
+    min_score = 0.40
+    max_items = 25
+
+    def __init__(self, **overrides):
+        for key, value in overrides.items():
+            if key not in self.fields():
+                raise ValueError(f"Unknown scoring setting: {key}")
+            setattr(self, key, tuple(value) if key == 'bonus_strategies' else value)
+
+    @classmethod
+    def fields(cls):
+        return [key for key, value in vars(ScoringConfig).items()
+                if not key.startswith('_') and not callable(value) and not isinstance(value, classmethod)]
+
+    def as_dict(self):
+        return {key: getattr(self, key) for key in self.fields()}
+
+    def __reduce__(self):
+        # Pickles as its settings (worker processes rebuild it)
+        return (_config_from_dict, (self.as_dict(),))
+
+
+def _config_from_dict(settings):
+    return ScoringConfig(**settings)
+
+
+def clean_medicine_name(text):
+    """Clean up medicine name text"""
+    # Remove excessive special characters
+    cleaned = SPECIAL_CHARS_RE.sub(' ', text)
+    # Remove extra spaces
+    cleaned = ' '.join(cleaned.split())
+    # Remove standalone numbers at the start/end
+    cleaned = LEADING_NUMBER_RE.sub('', cleaned)
+    cleaned = TRAILING_NUMBER_RE.sub('', cleaned)
+    return cleaned.strip()
+
+
+@functools.lru_cache(maxsize=FEATURE_CACHE_SIZE)
+def is_valid_text(text):
+    """Check if text is likely to be real readable text"""
+    if not text or len(text.strip()) < 2:
+        return False
+
+    # Must have at least some letters
+    if not HAS_LETTER_RE.search(text):
+        return False
+
+    # At least 70% of the non-space characters should be alphanumeric
+    alphanumeric = sum(c.isalnum() for c in text)
+    total = len(text.replace(' ', ''))
+    if total == 0:
+        return False
+    return alphanumeric / total >= 0.7
+
+
+@functools.lru_cache(maxsize=FEATURE_CACHE_SIZE)
+def text_features(text):
+    """(cleaned name, feature flags) for a stripped OCR text, or None if it can't be a name
+
+    Everything here depends on the text alone, so it is computed once per
+    unique text and shared across variants, cascade checks and requests.
+    """
+    # Skip very short text, pure numbers and known pack boilerplate
+    if len(text) < 3 or DIGITS_ONLY_RE.match(text) or SKIP_RE.search(text.upper()):
+        return None
+
+    # Skip if mostly special characters
+    if sum(c.isalpha() for c in text) < 3:
+        return None
+
+    cleaned_name = clean_medicine_name(text)
+    if not cleaned_name or len(cleaned_name) < 3:
+        return None
+
+    special_count = sum(not c.isalnum() and not c.isspace() for c in text)
+    flags = (
+        (text.istitle() or text.isupper()) and 5 <= len(text) <= 30,
+        bool(LETTER_RUN_RE.search(text) and DIGIT_RE.search(text)),
+        bool(HYPHEN_CODE_RE.search(text)),
+        5 <= len(text) <= 25,
+        bool(KEYWORD_RE.search(text.upper())),
+        len(text) > 40,
+        special_count > len(text) * 0.3,
+        bool(LEADING_DIGIT_RE.match(text)),
+    )
+    return cleaned_name, flags
+
+
+class CandidateScorer:
+    """Ranks OCR text elements as medicine name candidates, a whole batch of images in one vectorized pass"""
+
+    def __init__(self, config=None):
+        self.config = config or ScoringConfig()
+
+    def score(self, extracted_data):
+        """Sorted candidate list for one image's merged OCR results"""
+        return self.score_batch([extracted_data])[0]
+
+    def score_batch(self, batch):
+        """One sorted candidate list per extracted_data list in `batch`"""
+        cfg = self.config
+        owners, items, positions, features = [], [], [], []
+        for owner, extracted_data in enumerate(batch):
+            for idx, item in enumerate((extracted_data or [])[:cfg.max_items]):
+                text = item['text'].strip()
+                feature = text_features(text)
+                if feature is None:
+                    continue
+                owners.append(owner)
+                items.append((item, text, feature[0]))
+                positions.append(idx)
+                features.append(feature[1])
+
+        results = [[] for _ in batch]
+        if not items:
+            return results
+
+        idx = np.array(positions)
+        flags = np.array(features, dtype=bool)
+        confidence = np.array([float(item['confidence']) for item, _, _ in items])
+        area = np.array([float(item.get('area', 0)) for item, _, _ in items])
+        from_bonus_strategy = np.array([item.get('strategy') in cfg.bonus_strategies for item, _, _ in items])
+
+        position_score = 1.0 - (idx * cfg.position_decay)
+        score = confidence * cfg.confidence_weight + position_score * cfg.position_weight
+        score = score + np.where(area > 0, np.minimum(cfg.area_bonus_max, (area / 10000) * cfg.area_bonus_per_10k), 0.0)
+        score = score + np.where(idx < cfg.top_positions, cfg.top_position_bonus, 0.0)
+        score = score + np.where(flags[:, 0], cfg.case_bonus, 0.0)
+        score = score + np.where(flags[:, 1], cfg.alnum_bonus, 0.0)
+        score = score + np.where(flags[:, 2], cfg.hyphen_code_bonus, 0.0)
+        score = score + np.where(flags[:, 3], cfg.length_bonus, 0.0)
+        score = score + np.where(from_bonus_strategy & (confidence > cfg.strategy_bonus_min_confidence), cfg.strategy_bonus, 0.0)
+        score = score + np.where(flags[:, 4], cfg.keyword_bonus, 0.0)
+        score = score - np.where(flags[:, 5], cfg.long_text_penalty, 0.0)
+        score = score - np.where(flags[:, 6], cfg.special_char_penalty, 0.0)
+        score = score - np.where(flags[:, 7], cfg.leading_digit_penalty, 0.0)
+        score = np.round(score, 3)
+
+        for owner, (item, text, cleaned_name), position, value in zip(owners, items, positions, score):
+            if value <= cfg.min_score:
+                continue
+            confidence_value = item['confidence']
+            area_value = item.get('area', 0)
+            results[owner].append({
+                'name': cleaned_name,
+                'original_text': text,
+                'confidence': round(confidence_value * 100, 2),
+                'score': float(value),
+                'position': position + 1,
+                'strategy': item.get('strategy', 'unknown'),
+                'area': round(area_value, 2),
+                'bbox': item.get('bbox')
+            })
+
+        for candidates in results:
+            candidates.sort(key=lambda x: x['score'], reverse=True)
+        return results
@@ -0,0 +1,265 @@
+"""Command-line entry point for offline processing
+
+    python -m mediscan scan photos/ --out results.jsonl --workers 4
+    python -m mediscan scan photos/ --out results.parquet --workers 4 --cascade
+
+Walks a directory tree of pack photos and runs every image through
+MediScanExtractor and the safety check on a pool of worker processes, each
+loading the OCR model once. Rows are written as images finish: JSONL is
+flushed per row, Parquet is written as part files of --flush-every rows
+into the --out directory. Re-running the same command resumes: images
+already in the output are skipped, so an interrupted run only redoes the
+images whose rows were not written yet.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from job_queue import default_torch_threads, spawn_context
+
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp'}
+
+# Columns of a result row, in output order; Parquet parts share this schema
+ROW_COLUMNS = [
+    ('path', 'string'), ('success', 'bool'), ('error', 'string'),
+    ('medicine_name', 'string'), ('confidence', 'float64'), ('score', 'float64'),
+    ('strategy', 'string'), ('candidates', 'list<string>'), ('variants_run', 'int32'),
+    ('safety_found', 'bool'), ('safety_medicine_name', 'string'), ('safety_label', 'string'),
+    ('toxicity_index', 'float64'), ('side_effect_score', 'float64'), ('seconds', 'float64'),
+]
+
+PROGRESS_EVERY = 50
+
+_worker = {}
+
+
+def find_images(root):
+    """Image paths under root (relative to it), sorted"""
+    found = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in filenames:
+            if filename.rsplit('.', 1)[-1].lower() in IMAGE_EXTENSIONS:
+                found.append(os.path.relpath(os.path.join(dirpath, filename), root))
+    return sorted(found)
+
+
+def _init_worker(extractor_kwargs, safety_db_path):
+    """Pool initializer: one extractor (and model) per worker process"""
+    from medicine_extractor import MediScanExtractor
+    from medicine_safety import MedicineSafetyChecker
+
+    safety_checker = MedicineSafetyChecker(safety_db_path)
+    _worker['safety_checker'] = safety_checker
+    _worker['extractor'] = MediScanExtractor(safety_checker=safety_checker, **extractor_kwargs)
+
+
+def result_row(path, result, safety, seconds):
+    """Flat output row of one image"""
+    best = result.get('best_match') or {}
+    return {
+        'path': path,
+        'success': bool(result.get('success')),
+        'error': result.get('error'),
+        'medicine_name': best.get('name'),
+        'confidence': best.get('confidence'),
+        'score': best.get('score'),
+        'strategy': best.get('strategy'),
+        'candidates': [c['name'] for c in result.get('all_candidates', [])],
+        'variants_run': len(result.get('variants_run', [])),
+        'safety_found': bool(safety.get('found')),
+        'safety_medicine_name': safety.get('medicine_name'),
+        'safety_label': safety.get('label'),
+        'toxicity_index': safety.get('toxicity_index'),
+        'side_effect_score': safety.get('side_effect_score'),
+        'seconds': round(seconds, 3),
+    }
+
+
+def scan_one(task):
+    """Extraction + safety row for (root, relative path), in a worker"""
+    root, path = task
+    started = time.perf_counter()
+    result = _worker['extractor'].process_image(os.path.join(root, path))
+    if result.get('success') and result.get('best_match'):
+        safety = _worker['safety_checker'].check_safety(result['best_match']['name'])
+    else:
+        safety = {'found': False}
+    return result_row(path, result, safety, time.perf_counter() - started)
+
+
+class JsonlWriter:
+    """Appends rows to a JSONL file, one flushed line per row"""
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            self.done = self._recover()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _recover(self):
+        """Paths already written; cuts off a last line left half-written by a crash"""
+        done = set()
+        good_bytes = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)['path'])
+                except (ValueError, KeyError):
+                    break
+                good_bytes += len(line)
+        with open(self.path, 'r+b') as f:
+            f.truncate(good_bytes)
+        return done
+
+    def write(self, row):
+        self._file.write(json.dumps(row) + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """Writes rows as part-NNNNN.parquet files of `flush_every` rows into a directory
+
+    Part files are written to a temp name and renamed, so a crash never
+    leaves a partial part behind.
+    """
+
+    def __init__(self, path, flush_every=1000):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            sys.exit("❌ Parquet output needs pyarrow (pip install pyarrow)")
+        self.pa, self.pq = pa, pq
+        self.path = path
+        self.flush_every = flush_every
+        self.schema = pa.schema([(name, self._type(kind)) for name, kind in ROW_COLUMNS])
+        self._rows = []
+        os.makedirs(path, exist_ok=True)
+        parts = sorted(name for name in os.listdir(path) if name.startswith('part-') and name.endswith('.parquet'))
+        self._next_part = int(parts[-1][5:-8]) + 1 if parts else 0
+        self.done = set()
+        for name in parts:
+            self.done.update(pq.read_table(os.path.join(path, name), columns=['path']).column('path').to_pylist())
+
+    def _type(self, kind):
+        pa = self.pa
+        return {
+            'string': pa.string(), 'bool': pa.bool_(), 'int32': pa.int32(),
+            'float64': pa.float64(), 'list<string>': pa.list_(pa.string()),
+        }[kind]
+
+    def write(self, row):
+        self._rows.append(row)
+        if len(self._rows) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        table = self.pa.Table.from_pylist(self._rows, schema=self.schema)
+        name = f"part-{self._next_part:05d}.parquet"
+        tmp_path = os.path.join(self.path, f".{name}.tmp")
+        self.pq.write_table(table, tmp_path)
+        os.replace(tmp_path, os.path.join(self.path, name))
+        self._next_part += 1
+        self._rows = []
+
+    def close(self):
+        self.flush()
+
+
+def open_writer(path, flush_every):
+    if path.endswith('.parquet'):
+        return ParquetWriter(path, flush_every=flush_every)
+    return JsonlWriter(path)
+
+
+def scan(args):
+    images = find_images(args.root)
+    writer = open_writer(args.out, args.flush_every)
+    todo = [path for path in images if path not in writer.done]
+    print(f"🗂️ {len(images)} images under {args.root}, {len(images) - len(todo)} already in {args.out}, "
+          f"{len(todo)} to scan with {args.workers or 'no'} worker processes")
+    if not todo:
+        writer.close()
+        return
+
+    workers = max(0, args.workers)
+    extractor_kwargs = {
+        'cascade': args.cascade,
+        'shared_detection': args.shared_detection,
+        'roi': args.roi,
+        'lexicon': args.lexicon,
+        'backend': args.backend,
+        'onnx_dir': args.onnx_dir,
+        'torch_threads': args.torch_threads or default_torch_threads(workers),
+    }
+
+    pool = None
+    tasks = [(args.root, path) for path in todo]
+    if workers:
+        pool = spawn_context().Pool(workers, initializer=_init_worker, initargs=(extractor_kwargs, args.safety_db))
+        rows = pool.imap_unordered(scan_one, tasks)
+    else:
+        _init_worker(extractor_kwargs, args.safety_db)
+        rows = map(scan_one, tasks)
+
+    started = time.perf_counter()
+    done = failed = 0
+    try:
+        for row in rows:
+            writer.write(row)
+            done += 1
+            failed += not row['success']
+            if done % PROGRESS_EVERY == 0 or done == len(todo):
+                elapsed = time.perf_counter() - started
+                rate = done / elapsed if elapsed else 0.0
+                eta = (len(todo) - done) / rate if rate else 0.0
+                print(f"  {done}/{len(todo)} images, {rate:.2f} img/s, {failed} failed, ETA {eta / 60:.1f} min")
+    except KeyboardInterrupt:
+        print("\n⏹️ Interrupted; re-run the same command to resume")
+    finally:
+        if pool is not None:
+            pool.terminate()
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ {done} images in {elapsed:.1f}s ({done / elapsed if elapsed else 0.0:.2f} img/s), "
+          f"{failed} failed -> {args.out}")
+
+
+def main(argv=None):
+    from ocr_backend import BACKENDS
+
+    parser = argparse.ArgumentParser(prog='python -m mediscan', description="MediScan offline tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    scan_parser = subparsers.add_parser('scan', help="Extract medicine names from every image under a directory")
+    scan_parser.add_argument('root')
+    scan_parser.add_argument('--out', default='mediscan_results.jsonl',
+                             help="JSONL file, or a directory of Parquet parts if it ends in .parquet")
+    scan_parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 1) // 2),
+                             help="Worker processes (0 = scan in this process)")
+    scan_parser.add_argument('--flush-every', type=int, default=1000, help="Rows per Parquet part file")
+    scan_parser.add_argument('--safety-db', default=os.environ.get('MEDISCAN_SAFETY_DB', os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'medicine_safety.csv')))
+    scan_parser.add_argument('--cascade', action='store_true')
+    scan_parser.add_argument('--shared-detection', action='store_true')
+    scan_parser.add_argument('--roi', action='store_true')
+    scan_parser.add_argument('--lexicon', help="'safety_db' or a names file to snap candidates to")
+    scan_parser.add_argument('--backend', choices=BACKENDS, default='torch')
+    scan_parser.add_argument('--onnx-dir')
+    scan_parser.add_argument('--torch-threads', type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == 'scan':
+        scan(args)
+
+
+if __name__ == '__main__':
+    main()
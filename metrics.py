@@ -0,0 +1,190 @@
+import contextvars
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Latency buckets in seconds, from cheap OpenCV stages up to full OCR passes
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Memory buckets in bytes, 1 MB to 512 MB
+BYTES_BUCKETS = tuple(2 ** i * 1024 * 1024 for i in range(10))
+
+# Stage timings (ms) of the request being handled, if it asked for them
+_request_timings = contextvars.ContextVar('mediscan_request_timings', default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+PAGE_SIZE = resource.getpagesize() if resource is not None else 4096
+
+
+def resident_bytes():
+    """Current resident set size of this process, or None if unknown"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return peak_resident_bytes()
+
+
+def peak_resident_bytes():
+    """Peak resident set size of this process, or None if unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in pairs) + '}'
+
+
+class MetricsRegistry:
+    """Process-wide counters, gauges and latency histograms
+
+    Exported in the Prometheus text format by render(). Stage timers also
+    record into the current request's timing dict when one is active (see
+    request_timings), which is how per-request timings reach the response.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._help = {}
+        self._buckets = {}
+
+    def describe(self, name, text, buckets=None):
+        """Set a metric's help text, and for histograms optionally its buckets"""
+        self._help[name] = text
+        if buckets is not None:
+            self._buckets[name] = tuple(buckets)
+
+    def inc(self, name, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def total(self, name):
+        """Sum of a counter over all its label sets"""
+        with self._lock:
+            return sum(self._counters.get(name, {}).values())
+
+    def histogram_totals(self, name):
+        """(sum, count) of a histogram over all its label sets"""
+        with self._lock:
+            series = self._histograms.get(name, {}).values()
+            return sum(hist['sum'] for hist in series), sum(hist['count'] for hist in series)
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def add_gauge(self, name, delta, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._gauges.setdefault(name, {})
+            series[key] = series.get(key, 0) + delta
+
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        buckets = self._buckets.get(name, self.buckets)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = {'counts': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist['counts'][i] += 1
+            hist['sum'] += value
+            hist['count'] += 1
+
+    @contextmanager
+    def timer(self, stage):
+        """Time a pipeline stage into mediscan_stage_duration_seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(stage, time.perf_counter() - started)
+
+    def record_stage(self, stage, seconds):
+        self.observe('mediscan_stage_duration_seconds', seconds, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = round(timings.get(stage, 0.0) + seconds * 1000, 2)
+
+    @contextmanager
+    def request_timings(self):
+        """Collect per-stage timings (ms) of the code run inside the block"""
+        timings = {}
+        token = _request_timings.set(timings)
+        self.add_gauge('mediscan_requests_in_flight', 1)
+        try:
+            yield timings
+        finally:
+            self.add_gauge('mediscan_requests_in_flight', -1)
+            _request_timings.reset(token)
+
+    def render(self):
+        """Prometheus text exposition of every metric"""
+        lines = []
+        with self._lock:
+            for kind, store in (('counter', self._counters), ('gauge', self._gauges)):
+                for name, series in sorted(store.items()):
+                    if name in self._help:
+                        lines.append(f"# HELP {name} {self._help[name]}")
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in sorted(series.items()):
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                buckets = self._buckets.get(name, self.buckets)
+                for key, hist in sorted(series.items()):
+                    for bound, count in zip(buckets, hist['counts']):
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {hist['count']}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {hist['sum']}")
+                    lines.append(f"{name}_count{_format_labels(key)} {hist['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.describe('mediscan_stage_duration_seconds', 'Time spent per pipeline stage')
+metrics.describe('mediscan_requests_total', 'HTTP extraction requests by endpoint and outcome')
+metrics.describe('mediscan_request_duration_seconds', 'End-to-end HTTP extraction latency by endpoint')
+metrics.describe('mediscan_variants_run_total', 'Preprocessing variants sent through OCR')
+metrics.describe('mediscan_variants_skipped_total', 'Preprocessing variants skipped by the cascade')
+metrics.describe('mediscan_ocr_pixels_total', 'Pixels of the images sent through OCR, by variant')
+metrics.describe('mediscan_text_elements_total', 'Unique text elements found per image, summed')
+metrics.describe('mediscan_preprocess_peak_bytes', 'Peak bytes of image buffers held while preprocessing one image',
+                 buckets=BYTES_BUCKETS)
+metrics.describe('mediscan_requests_in_flight', 'Extraction requests being processed')
+metrics.describe('mediscan_process_resident_bytes', 'Resident set size of this process')
+metrics.describe('mediscan_process_peak_resident_bytes', 'Peak resident set size of this process')
+metrics.describe('mediscan_safety_lookups_total', 'Safety DB lookups by match type (exact, fuzzy, miss)')
+metrics.describe('mediscan_scan_sessions_open', 'Open webcam scanning sessions')
+metrics.describe('mediscan_scan_frames_total', 'Webcam scan frames by gate outcome (new view, duplicate, blurry, unreadable)')
+metrics.describe('mediscan_lexicon_snaps_total', 'Candidate names snapped to the medicine lexicon by match type (exact, fuzzy, miss)')
+metrics.describe('mediscan_ocr_batch_crops', 'Text crops per coalesced recognizer batch (OCR scheduler)',
+                 buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+metrics.describe('mediscan_ocr_batch_wait_seconds', 'Time recognition work waited in the OCR scheduler queue')
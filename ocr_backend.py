@@ -0,0 +1,167 @@
+import inspect
+import os
+import threading
+
+# Inference backends for the EasyOCR networks:
+#   torch       EasyOCR's default CPU setup: fp32 CRAFT detector, recognizer
+#               with dynamic int8 LSTM/Linear layers (quantize=True)
+#   torch_fp32  both networks in plain fp32 (the accuracy reference)
+#   onnx        both networks exported to ONNX and run by ONNX Runtime
+#   onnx_int8   as onnx, with the recognizer's LSTM/MatMul weights in int8
+#               (int8 convolutions make the CRAFT detector slower on CPU, so
+#               it stays fp32, as in the torch backend)
+# All of them keep EasyOCR's pre/post-processing, so readtext, detect and
+# recognize return exactly the same structure. torch and easyocr are only
+# imported once a reader is built, so importing this module stays cheap.
+BACKENDS = ('torch', 'torch_fp32', 'onnx', 'onnx_int8')
+
+DEFAULT_ONNX_DIR = os.path.join(os.path.expanduser('~'), '.EasyOCR', 'onnx')
+
+# ONNX opset for the TorchScript-based exporter (LSTM + dynamic Resize)
+ONNX_OPSET = 17
+
+
+class OnnxModule:
+    """Stand-in for an EasyOCR torch network, backed by an ONNX Runtime session
+
+    Takes and returns torch tensors like the module it replaces. The session
+    is created on first use in each process: an ONNX Runtime thread pool
+    does not survive fork, so preloading servers must not inherit one.
+    """
+
+    def __init__(self, path, threads=None):
+        self.path = path
+        self.threads = threads
+        self._session = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def session(self):
+        if self._session is None or self._pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._pid != os.getpid():
+                    import onnxruntime as ort
+                    import torch
+                    options = ort.SessionOptions()
+                    options.intra_op_num_threads = self.threads or torch.get_num_threads()
+                    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+                    self._session = ort.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+                    self._pid = os.getpid()
+        return self._session
+
+    def eval(self):
+        return self
+
+    def to(self, device):
+        return self
+
+    def __call__(self, x, *unused):
+        import torch
+        session = self.session()
+        outputs = session.run(None, {session.get_inputs()[0].name: x.detach().cpu().numpy()})
+        outputs = [torch.from_numpy(output) for output in outputs]
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+
+def _recognizer_for_export(model):
+    """easyocr's recognizer forward pass in an exportable form"""
+    import torch
+
+    class RecognizerForExport(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, image):
+            visual_feature = self.model.FeatureExtraction(image)
+            # AdaptiveAvgPool2d((None, 1)) as a mean: adaptive pooling only exports with a fixed width
+            visual_feature = visual_feature.permute(0, 3, 1, 2).mean(dim=3)
+            contextual_feature = self.model.SequenceModeling(visual_feature)
+            return self.model.Prediction(contextual_feature.contiguous())
+
+    return RecognizerForExport(model)
+
+
+def _export(module, example, path, input_name, output_names, dynamic_axes):
+    """torch.onnx.export to `path`, atomically (workers may export concurrently)"""
+    import torch
+    kwargs = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        # The TorchScript exporter handles dynamic_axes the same on every torch version
+        kwargs['dynamo'] = False
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            module, (example,), tmp_path,
+            input_names=[input_name],
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET,
+            **kwargs
+        )
+    os.replace(tmp_path, path)
+
+
+def _quantize(fp32_path, int8_path):
+    """Dynamic int8 weight quantization of the sequence layers of an exported model"""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    tmp_path = f"{int8_path}.{os.getpid()}.tmp"
+    quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8,
+                     op_types_to_quantize=['LSTM', 'MatMul', 'Gemm'])
+    os.replace(tmp_path, int8_path)
+
+
+def export_onnx_models(reader, onnx_dir, quantize=False):
+    """Export (once) the detector and recognizer of an fp32 Reader; returns their paths"""
+    import torch
+    os.makedirs(onnx_dir, exist_ok=True)
+    detector_path = os.path.join(onnx_dir, 'craft.onnx')
+    recognizer_path = os.path.join(onnx_dir, f"recognizer_{reader.model_lang}.onnx")
+
+    if not os.path.exists(detector_path):
+        print(f"📦 Exporting text detector to {detector_path}...")
+        _export(
+            reader.detector, torch.randn(1, 3, 480, 640), detector_path, 'image', ['y', 'feature'],
+            {'image': {0: 'batch', 2: 'height', 3: 'width'},
+             'y': {0: 'batch', 1: 'out_height', 2: 'out_width'},
+             'feature': {0: 'batch', 2: 'out_height', 3: 'out_width'}}
+        )
+    if not os.path.exists(recognizer_path):
+        print(f"📦 Exporting text recognizer to {recognizer_path}...")
+        _export(
+            _recognizer_for_export(reader.recognizer).eval(), torch.randn(2, 1, 64, 256), recognizer_path,
+            'image', ['prediction'],
+            {'image': {0: 'batch', 3: 'width'}, 'prediction': {0: 'batch', 1: 'steps'}}
+        )
+
+    if not quantize:
+        return detector_path, recognizer_path
+
+    int8_path = recognizer_path.replace('.onnx', '_int8.onnx')
+    if not os.path.exists(int8_path):
+        print(f"📦 Quantizing {os.path.basename(recognizer_path)} to int8...")
+        _quantize(recognizer_path, int8_path)
+    return detector_path, int8_path
+
+
+def create_reader(backend='torch', onnx_dir=None, threads=None):
+    """An easyocr.Reader for English whose networks run on the given backend"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown OCR backend {backend!r} (expected one of {', '.join(BACKENDS)})")
+    import easyocr
+
+    if backend == 'torch':
+        return easyocr.Reader(['en'], gpu=False)
+
+    # Exporting needs the plain fp32 torch modules
+    reader = easyocr.Reader(['en'], gpu=False, quantize=False)
+    if backend == 'torch_fp32':
+        return reader
+
+    detector_path, recognizer_path = export_onnx_models(
+        reader, onnx_dir or DEFAULT_ONNX_DIR, quantize=backend == 'onnx_int8'
+    )
+    # Dropping the torch modules frees their weights
+    reader.detector = OnnxModule(detector_path, threads=threads)
+    reader.recognizer = OnnxModule(recognizer_path, threads=threads)
+    return reader
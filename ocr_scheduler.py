@@ -0,0 +1,117 @@
+import threading
+import time
+from contextlib import contextmanager
+from metrics import metrics
+
+
+class _Job:
+    """One caller's recognition work and, once dispatched, its result"""
+
+    def __init__(self, img, horizontal_list, free_list):
+        self.args = (img, horizontal_list, free_list)
+        self.crops = len(horizontal_list) + len(free_list)
+        self.submitted_at = time.perf_counter()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RecognitionScheduler:
+    """Coalesces recognition work of concurrent callers into batched recognizer calls
+
+    A batch is dispatched once it holds `max_batch` crops, once its oldest
+    job waited `max_wait_ms`, or as soon as no other caller is preparing work.
+    """
+
+    def __init__(self, recognize, max_wait_ms=10.0, max_batch=64):
+        self.recognize = recognize
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self._cond = threading.Condition()
+        self._queue = []
+        self._queued_crops = 0
+        # Callers inside slot() that have not submitted yet
+        self._preparing = 0
+        self._thread = None
+
+    @contextmanager
+    def slot(self):
+        """Announce upcoming work; yields the submit function to call (at most once)
+
+        While a caller holds an unused slot (e.g. while its text detector
+        runs) the dispatcher keeps the batch open for it, up to max_wait_ms.
+        """
+        used = []
+
+        def submit(img, horizontal_list, free_list):
+            used.append(True)
+            return self.submit(img, horizontal_list, free_list, reserved=True)
+
+        with self._cond:
+            self._preparing += 1
+        try:
+            yield submit
+        finally:
+            if not used:
+                with self._cond:
+                    self._preparing -= 1
+                    self._cond.notify()
+
+    def submit(self, img, horizontal_list, free_list, reserved=False):
+        """Recognize the regions of one image; blocks until its batch has run
+
+        Returns the readtext-style [(bbox, text, confidence), ...] list of
+        the image, or raises the error of its batch.
+        """
+        job = _Job(img, horizontal_list, free_list)
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='ocr-scheduler', daemon=True)
+                self._thread.start()
+            if reserved:
+                self._preparing -= 1
+            self._queue.append(job)
+            self._queued_crops += job.crops
+            self._cond.notify()
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _next_batch(self):
+        """Wait for a batch to be ready and take it off the queue"""
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            deadline = self._queue[0].submitted_at + self.max_wait
+            while self._queued_crops < self.max_batch and self._preparing > 0:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            # Whole jobs up to max_batch crops; an oversized job goes alone
+            batch, crops = [], 0
+            while self._queue and (not batch or crops + self._queue[0].crops <= self.max_batch):
+                job = self._queue.pop(0)
+                batch.append(job)
+                crops += job.crops
+            self._queued_crops -= crops
+            return batch, crops
+
+    def _run(self):
+        while True:
+            batch, crops = self._next_batch()
+            started = time.perf_counter()
+            for job in batch:
+                metrics.observe('mediscan_ocr_batch_wait_seconds', started - job.submitted_at)
+            metrics.observe('mediscan_ocr_batch_crops', crops)
+            try:
+                results = self.recognize([job.args for job in batch])
+                for job, result in zip(batch, results):
+                    job.result = result
+            except Exception as e:
+                for job in batch:
+                    job.error = e
+            for job in batch:
+                job.done.set()
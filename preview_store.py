@@ -0,0 +1,46 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class PreviewStore:
+    """Bounded in-memory store of uploaded images for the preview URL
+
+    Used instead of writing every upload to static/uploads. Images are keyed
+    by a hash of their bytes, so re-uploads share one entry, and the least
+    recently used ones are dropped once `max_bytes` or `max_entries` is hit.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=512):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def put(self, data, mimetype):
+        """Store image bytes and return their preview id"""
+        preview_id = hashlib.sha256(data).hexdigest()[:32]
+        with self._lock:
+            if preview_id in self._items:
+                self._items.move_to_end(preview_id)
+                return preview_id
+
+            self._items[preview_id] = (bytes(data), mimetype)
+            self._size += len(data)
+            while self._items and (self._size > self.max_bytes or len(self._items) > self.max_entries):
+                _, (evicted, _) = self._items.popitem(last=False)
+                self._size -= len(evicted)
+        return preview_id
+
+    def get(self, preview_id):
+        """(bytes, mimetype) for a preview id, or None once evicted"""
+        with self._lock:
+            item = self._items.get(preview_id)
+            if item is not None:
+                self._items.move_to_end(preview_id)
+            return item
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._items), 'bytes': self._size, 'max_bytes': self.max_bytes}
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from metrics import metrics
+
+
+class ResultCache:
+    """Content-addressed cache of extraction results
+
+    An in-memory LRU tier, optionally mirrored to a SQLite file shared by
+    worker processes (best effort: disk errors count as misses).
+    """
+
+    def __init__(self, max_entries=256, ttl=3600, disk_path=None, disk_max_entries=10000, disk_timeout=2.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self.disk_max_entries = disk_max_entries
+        # Seconds to wait for another process's write lock before giving up
+        self.disk_timeout = disk_timeout
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'memory_hits': 0, 'disk_hits': 0, 'disk_errors': 0}
+
+        # The SQLite connection is opened on first use in each process: a
+        # connection must not be carried across fork() (preload-and-fork)
+        self._db = None
+        self._db_pid = None
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+
+    def _connection(self):
+        """This process's SQLite connection, or None without a disk tier (call with _lock held)"""
+        if not self.disk_path:
+            return None
+        if self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.disk_path, timeout=self.disk_timeout, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS results ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at)')
+            self._db.commit()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _disk_error(self, operation, error):
+        """Count a failed disk tier operation (call with _lock held)"""
+        self._counters['disk_errors'] += 1
+        metrics.inc('mediscan_result_cache_disk_errors_total', operation=operation)
+        print(f"⚠️ Result cache disk {operation} failed: {error}")
+
+    @staticmethod
+    def make_key(image_bytes, config):
+        """Hash of the image content plus the pipeline configuration"""
+        digest = hashlib.sha256(image_bytes)
+        digest.update(json.dumps(config, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._counters['hits'] += 1
+                    self._counters['memory_hits'] += 1
+                    return json.loads(value)
+                del self._memory[key]
+
+            try:
+                db = self._connection()
+                row = db.execute(
+                    'SELECT value, created_at FROM results WHERE key = ?', (key,)
+                ).fetchone() if db is not None else None
+            except sqlite3.Error as e:
+                self._disk_error('get', e)
+                row = None
+            if row is not None and now - row[1] <= self.ttl:
+                # Promote to the memory tier
+                self._store_memory(key, row[0], row[1])
+                self._counters['hits'] += 1
+                self._counters['disk_hits'] += 1
+                return json.loads(row[0])
+
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, key, value):
+        """Store a JSON-serializable value under key"""
+        serialized = json.dumps(value)
+        created_at = time.time()
+        with self._lock:
+            self._store_memory(key, serialized, created_at)
+
+            try:
+                db = self._connection()
+                if db is not None:
+                    with db:
+                        db.execute(
+                            'INSERT OR REPLACE INTO results (key, value, created_at) VALUES (?, ?, ?)',
+                            (key, serialized, created_at)
+                        )
+                        self._evict_disk(db, created_at)
+            except sqlite3.Error as e:
+                self._disk_error('put', e)
+
+    def _store_memory(self, key, serialized, created_at):
+        self._memory[key] = (created_at, serialized)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, db, now):
+        """Drop expired rows, then the oldest rows beyond disk_max_entries"""
+        db.execute('DELETE FROM results WHERE created_at < ?', (now - self.ttl,))
+        db.execute(
+            'DELETE FROM results WHERE key IN ('
+            'SELECT key FROM results ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+            (self.disk_max_entries,)
+        )
+
+    def clear(self):
+        """Remove every entry from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            db = self._connection()
+            if db is not None:
+                db.execute('DELETE FROM results')
+                db.commit()
+
+    def stats(self):
+        """Hit/miss counters and current tier sizes"""
+        with self._lock:
+            disk_entries = None
+            try:
+                db = self._connection()
+                if db is not None:
+                    disk_entries = db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+            except sqlite3.Error as e:
+                self._disk_error('stats', e)
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+            if self.disk_path:
+                stats['disk_entries'] = disk_entries
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
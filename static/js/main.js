@@ -26,16 +26,65 @@ extractBtn.onclick = async () => {
     fd.append("file", selectedFile);
 
     try {
-        const res = await fetch("/api/extract", { method: "POST", body: fd });
-        const data = await res.json();
-        renderResults(data);
+        const res = await fetch("/api/extract/stream", { method: "POST", body: fd });
+        if (!res.ok || !res.body) {
+            // Validation errors come back as plain JSON
+            renderResults(await res.json());
+        } else {
+            await readEvents(res, handleEvent);
+        }
     } catch {
         showError("Server error");
     }
 
+    setProgress(null);
     loadingSpinner.classList.add("d-none");
 };
 
+// Provisional results arrive after every OCR pass, the final one last
+function handleEvent(kind, data) {
+    if (kind === "progress") {
+        setProgress(data);
+        if (data.success) renderResults(data);
+    } else if (kind === "result") {
+        renderResults(data);
+    }
+}
+
+function setProgress(data) {
+    const label = loadingSpinner.querySelector("p");
+    label.innerText = data
+        ? `Analyzing image with AI... (${data.variants_done}/${data.variants_total} passes)`
+        : "Analyzing image with AI...";
+}
+
+// Minimal Server-Sent Events parser over a fetch() body (EventSource can't POST)
+async function readEvents(res, onEvent) {
+    const reader = res.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let end;
+        while ((end = buffer.indexOf("\n\n")) !== -1) {
+            const frame = buffer.slice(0, end);
+            buffer = buffer.slice(end + 2);
+
+            let kind = "message";
+            const lines = [];
+            for (const line of frame.split("\n")) {
+                if (line.startsWith("event:")) kind = line.slice(6).trim();
+                else if (line.startsWith("data:")) lines.push(line.slice(5).trim());
+            }
+            if (lines.length) onEvent(kind, JSON.parse(lines.join("\n")));
+        }
+    }
+}
+
 function renderResults(data) {
     resultsCard.classList.remove("d-none");
 
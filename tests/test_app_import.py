@@ -0,0 +1,15 @@
+"""Importing the app must not load the OCR stack"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_app_does_not_load_torch():
+    # A fresh interpreter: other tests may have imported anything already
+    code = "import sys, app; print('loaded:', *(m for m in ('torch', 'easyocr', 'scipy') if m in sys.modules))"
+    env = dict(os.environ, MEDISCAN_WARMUP='0', MEDISCAN_TORCH_THREADS='2')
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.splitlines()[-1] == 'loaded:'
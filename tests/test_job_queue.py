@@ -0,0 +1,47 @@
+"""ExtractionJobQueue crash handling, with a stand-in worker instead of the OCR model"""
+import os
+import time
+
+from job_queue import ExtractionJobQueue
+
+
+def crashing_worker(tasks, events, extractor_kwargs, safety_db_path, current_job):
+    """_worker_main's protocol; b'crash' kills the process right after dequeuing"""
+    events.send(('ready', os.getpid(), None))
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        job_id, image = task
+        current_job.value = job_id.encode('ascii')
+        if image == b'crash':
+            os._exit(3)
+        events.send(('started', job_id, time.time()))
+        events.send(('done', job_id, ({'success': True}, time.time())))
+
+
+class StandInQueue(ExtractionJobQueue):
+    def _start_worker(self, i):
+        self._current_jobs[i].value = b''
+        events, worker_events = self._ctx.Pipe(duplex=False)
+        process = self._ctx.Process(
+            target=crashing_worker, args=(self._tasks, worker_events, {}, None, self._current_jobs[i]), daemon=True
+        )
+        process.start()
+        worker_events.close()
+        self._workers[i] = process
+        self._events[i] = events
+
+
+def test_crash_before_started_fails_only_that_job():
+    jobs = StandInQueue(num_workers=1, max_pending=8)
+    try:
+        images = [b'ok', b'crash', b'ok', b'crash', b'ok']
+        job_ids = [jobs.submit(image) for image in images]
+        statuses = [jobs.get(job_id, wait=30)['status'] for job_id in job_ids]
+        # The finished job sent right before a crash keeps its result
+        assert statuses == ['done', 'failed', 'done', 'failed', 'done']
+        stats = jobs.stats()
+        assert (stats['queued'], stats['running'], stats['completed'], stats['failed']) == (0, 0, 3, 2)
+    finally:
+        jobs.shutdown()
@@ -0,0 +1,94 @@
+"""MedicineLexicon trie search against plain edit distance"""
+import csv
+import random
+
+from medicine_lexicon import MedicineLexicon, SafetyDBLexicon
+from medicine_safety import MedicineSafetyChecker, read_csv_rows
+
+ALPHABET = 'abcde '
+
+
+def edit_distance(a, b):
+    row = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        previous, row[0] = row[0], i
+        for j, cb in enumerate(b, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (ca != cb))
+    return row[-1]
+
+
+def mutate(rng, text, edits):
+    for _ in range(edits):
+        pos = rng.randrange(len(text) + 1)
+        kind = rng.choice(['insert', 'delete', 'replace'])
+        if kind == 'insert' or not text:
+            text = text[:pos] + rng.choice(ALPHABET) + text[pos:]
+        elif kind == 'delete':
+            text = text[:pos] + text[pos + 1:]
+        else:
+            text = text[:pos] + rng.choice(ALPHABET) + text[pos + 1:]
+    return text
+
+
+def random_lexicon(rng):
+    # A small alphabet packs many names within a few edits of each other
+    names = [''.join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 12))) for _ in range(rng.randint(1, 300))]
+    return MedicineLexicon(names)
+
+
+def test_nearest_matches_edit_distance():
+    rng = random.Random(4)
+    for _ in range(40):
+        lexicon = random_lexicon(rng)
+        for _ in range(40):
+            if rng.random() < 0.8:
+                key = mutate(rng, rng.choice(lexicon.keys), rng.randint(0, 3))
+            else:
+                key = ''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 14)))
+            edits = rng.randint(0, 3)
+            distances = [edit_distance(key, name) for name in lexicon.keys]
+            expected = min(distances)
+            found = lexicon.nearest(key, edits)
+            if expected > edits:
+                assert found is None, (key, edits)
+            else:
+                assert found is not None, (key, edits)
+                distance, idx = found
+                assert distance == expected
+                assert distances[idx] == distance
+
+
+def test_snap_falls_back_to_word_runs():
+    lexicon = MedicineLexicon(['Paracetamol', 'Amoxicillin Clavulanate', 'Dolo'])
+    match = lexicon.snap('Paracetam0l Tablets IP')
+    assert match['name'] == 'Paracetamol'
+    assert match['distance'] == 1
+    # The longest word run with a match wins over its single words
+    assert lexicon.snap('Tab Amoxicilin Clavulanate 625')['name'] == 'Amoxicillin Clavulanate'
+    # Short spans need an exact match
+    assert lexicon.snap('Dolo 650')['name'] == 'Dolo'
+    assert lexicon.snap('Dolx 650') is None
+    assert lexicon.snap('MRP Rs 45') is None
+
+
+def test_safety_db_lexicon_follows_reload(tmp_path):
+    rows = read_csv_rows('medicine_safety.csv')
+    path = tmp_path / 'safety.csv'
+
+    def write(rows):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    write(rows)
+    checker = MedicineSafetyChecker(str(path))
+    lexicon = SafetyDBLexicon(checker)
+    assert lexicon.snap('Zentravimab') is None
+    before = lexicon.current()
+
+    write(rows + [{**rows[0], 'medicine_name': 'Zentravimab', 'ingredients': 'Zentravimab'}])
+    checker.reload()
+    assert lexicon.current() is not before
+    assert len(lexicon) == len(before) + 1
+    assert lexicon.snap('Zentravirnab')['name'] == 'Zentravimab'
@@ -0,0 +1,78 @@
+"""overlap_pairs / overlap_clusters against brute-force all-pairs IoU"""
+import numpy as np
+import pytest
+
+from medicine_extractor import overlap_clusters, overlap_pairs
+
+
+def reference_iou(a, b):
+    width = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    height = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / max(union, 1e-9)
+
+
+def reference_pairs(boxes, threshold):
+    return {(i, j) for i in range(len(boxes)) for j in range(i + 1, len(boxes))
+            if reference_iou(boxes[i], boxes[j]) >= threshold}
+
+
+def reference_clusters(boxes, threshold):
+    """Smallest box index of each box's connected component"""
+    neighbours = {i: set() for i in range(len(boxes))}
+    for i, j in reference_pairs(boxes, threshold):
+        neighbours[i].add(j)
+        neighbours[j].add(i)
+    labels = [None] * len(boxes)
+    for start in range(len(boxes)):
+        if labels[start] is not None:
+            continue
+        stack = [start]
+        labels[start] = start
+        while stack:
+            for other in neighbours[stack.pop()]:
+                if labels[other] is None:
+                    labels[other] = start
+                    stack.append(other)
+    return labels
+
+
+def random_boxes(rng, count, integer):
+    """OCR-like boxes: text lines plus the same words re-read by other variants"""
+    lines = rng.uniform(0, 600, size=max(1, count // 6))
+    x0 = rng.uniform(0, 800, size=count)
+    y0 = rng.choice(lines, size=count) + rng.normal(0, 4, size=count)
+    width = rng.uniform(0, 160, size=count)
+    height = rng.uniform(0, 40, size=count)
+    boxes = np.stack([x0, y0, x0 + width, y0 + height], axis=1)
+    # The same word as read by another variant: slightly shifted, or exactly equal
+    repeats = rng.integers(0, count, size=count // 2)
+    boxes[rng.integers(0, count, size=count // 2)] = boxes[repeats] + rng.normal(0, 1.5, size=(len(repeats), 4))
+    if integer:
+        boxes = np.round(boxes)
+    repeats = rng.integers(0, count, size=count // 4)
+    boxes[rng.integers(0, count, size=count // 4)] = boxes[repeats]
+    return boxes
+
+
+@pytest.mark.parametrize('threshold', [0.1, 0.5, 0.9])
+@pytest.mark.parametrize('integer', [False, True])
+def test_overlap_pairs_match_brute_force(threshold, integer):
+    rng = np.random.default_rng(3)
+    for count in [0, 1, 2, 5, 30, 120]:
+        for _ in range(10):
+            boxes = random_boxes(rng, count, integer)
+            first, second = overlap_pairs(boxes, threshold)
+            pairs = [(min(i, j), max(i, j)) for i, j in zip(first.tolist(), second.tolist())]
+            assert len(pairs) == len(set(pairs))
+            assert set(pairs) == reference_pairs(boxes, threshold)
+
+
+@pytest.mark.parametrize('threshold', [0.1, 0.5, 0.9])
+def test_overlap_clusters_match_connected_components(threshold):
+    rng = np.random.default_rng(5)
+    for count in [0, 1, 4, 40, 150]:
+        for _ in range(10):
+            boxes = random_boxes(rng, count, integer=bool(rng.integers(2)))
+            assert overlap_clusters(boxes, threshold) == reference_clusters(boxes, threshold)
@@ -0,0 +1,28 @@
+"""ResultCache disk tier failures"""
+import sqlite3
+
+from result_cache import ResultCache
+
+
+def test_locked_disk_tier_is_best_effort(tmp_path):
+    path = str(tmp_path / 'results.sqlite')
+    cache = ResultCache(disk_path=path, disk_timeout=0.05)
+    cache.put('warm', {'name': 'Dolo'})
+
+    # Another process holding the write lock
+    other = sqlite3.connect(path)
+    other.execute('BEGIN EXCLUSIVE')
+    try:
+        cache.put('key', {'name': 'Crocin'})
+        assert cache.get('key') == {'name': 'Crocin'}
+        cache._memory.clear()
+        assert cache.get('warm') is None
+        assert cache.stats()['disk_errors'] == 3
+    finally:
+        other.rollback()
+        other.close()
+
+    cache.put('key', {'name': 'Crocin'})
+    cache._memory.clear()
+    assert cache.get('key') == {'name': 'Crocin'}
+    assert cache.get('warm') == {'name': 'Dolo'}
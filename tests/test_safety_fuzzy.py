@@ -0,0 +1,154 @@
+"""Fuzzy safety lookups against plain difflib scans and the search they replaced"""
+import os
+from collections import Counter
+from difflib import SequenceMatcher, get_close_matches
+import numpy as np
+import pytest
+
+from bench.safety import synthetic_rows, typo
+from medicine_safety import MedicineSafetyChecker, compile_rows, read_csv_rows, normalize_name, trigrams
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def build_db(path, size):
+    rng = np.random.default_rng(0)
+    rows = synthetic_rows(read_csv_rows(os.path.join(BASE_DIR, 'medicine_safety.csv')), size, rng)
+    path.write_bytes(compile_rows(rows))
+    return str(path)
+
+
+@pytest.fixture(scope='module')
+def db_path(tmp_path_factory):
+    return build_db(tmp_path_factory.mktemp('safety') / 'synthetic.msdb', 20000)
+
+
+@pytest.fixture(scope='module')
+def checker(db_path):
+    return MedicineSafetyChecker(db_path, cache_size=0)
+
+
+@pytest.fixture(scope='module')
+def row_grams(checker):
+    return [trigrams(checker.table.name(idx)) for idx in range(len(checker.table))]
+
+
+def queries(table, count, seed):
+    rng = np.random.default_rng(seed)
+    names = []
+    for i in range(count):
+        name = table.name(int(rng.integers(len(table))))
+        if i % 3 == 0 and any(c.isalpha() for c in name):
+            name = typo(name, rng)
+        elif i % 3 == 1:
+            name = name[:2] + name[3:]
+        if i % 11 == 0:
+            name = ''.join(rng.choice(list('abcxyzq'), size=6))
+        names.append(normalize_name(name))
+    return names
+
+
+def reference_candidates(table, name, limit):
+    """The original selection: argpartition top `limit` shared-trigram counts"""
+    postings = [table.gram_postings(gram) for gram in trigrams(name)]
+    if not postings:
+        return []
+    counts = np.bincount(np.concatenate(postings), minlength=len(table))
+    top = np.argpartition(counts, len(table) - limit)[-limit:]
+    return [int(idx) for idx in top if counts[idx] > 0], counts
+
+
+def shared_counts(row_grams, name):
+    """Trigrams each row shares with name, by plain set intersection"""
+    grams = trigrams(name)
+    return np.array([len(grams & row) for row in row_grams])
+
+
+def closest(name, candidates, cutoff):
+    """Plain difflib scan: the best candidate with ratio >= cutoff, or None"""
+    matches = get_close_matches(name, candidates, n=1, cutoff=cutoff)
+    return matches[0] if matches else None
+
+
+def ratio(name, candidate):
+    return SequenceMatcher(None, candidate, name).ratio()
+
+
+def test_candidates_match_argpartition_counts(checker):
+    table = checker.table
+    for name in queries(table, 300, seed=1):
+        candidates = checker._fuzzy_candidates(table, name)
+        assert len(set(candidates)) == len(candidates)
+        reference = reference_candidates(table, name, checker.FUZZY_MAX_CANDIDATES)
+        if not reference:
+            assert list(candidates) == []
+            continue
+        old, counts = reference
+        # Rows tied at the cut-off count may differ; the counts selected may not
+        assert sorted(counts[old]) == sorted(counts[candidates])
+
+
+def test_uncapped_lookup_matches_full_scan(db_path, row_grams):
+    # With the cap out of the way every row sharing a trigram is verified
+    uncapped = MedicineSafetyChecker(db_path, cache_size=0)
+    uncapped.FUZZY_MAX_CANDIDATES = len(uncapped.table) - 1
+    table = uncapped.table
+    for name in queries(table, 150, seed=2):
+        sharing = np.flatnonzero(shared_counts(row_grams, name))
+        expected = closest(name, [table.name(int(idx)) for idx in sharing], uncapped.FUZZY_CUTOFF)
+        found = uncapped._fuzzy_lookup(table, name)
+        assert (table.name(found) if found is not None else None) == expected, name
+
+
+def test_lookup_finds_the_best_of_the_top_rows(checker, row_grams):
+    table = checker.table
+    cutoff = checker.FUZZY_CUTOFF
+    for name in queries(table, 150, seed=4):
+        counts = shared_counts(row_grams, name)
+        # Rows above the cap's count must be verified; rows at it may be
+        at_cap = max(int(np.sort(counts)[-checker.FUZZY_MAX_CANDIDATES]), 1)
+        must = closest(name, [table.name(int(idx)) for idx in np.flatnonzero(counts > at_cap)], cutoff)
+        found = checker._fuzzy_lookup(table, name)
+        if found is None:
+            assert must is None, name
+            continue
+        assert counts[found] >= at_cap
+        assert ratio(name, table.name(found)) >= max(cutoff, ratio(name, must) if must is not None else 0)
+
+
+def test_small_table_matches_get_close_matches(tmp_path):
+    # Up to FUZZY_MAX_CANDIDATES rows every name is verified, as in difflib
+    small = MedicineSafetyChecker(build_db(tmp_path / 'small.msdb', 50), cache_size=0)
+    table = small.table
+    assert len(table) <= small.FUZZY_MAX_CANDIDATES
+    names = [table.name(idx) for idx in range(len(table))]
+    for name in queries(table, 300, seed=5):
+        found = small._fuzzy_lookup(table, name)
+        assert (table.name(found) if found is not None else None) == closest(name, names, small.FUZZY_CUTOFF), name
+
+
+def test_batch_matches_single_lookups(checker):
+    names = [name.upper() if i % 4 == 0 else name for i, name in enumerate(queries(checker.table, 120, seed=3))]
+    names += names[:10] + ['', 'zzzzzz']
+    batch = checker.check_safety_batch(names)
+
+    singles = [checker.check_safety(name) for name in names]
+    for name, single, result in zip(names, singles, batch['results']):
+        assert result['query'] == name
+        assert {key: value for key, value in result.items() if key not in ('query', 'match')} == single
+
+    found = [single for single in singles if single['found']]
+    summary = batch['summary']
+    assert summary['medicines'] == len(names)
+    assert summary['found'] == len(found)
+    assert summary['not_found'] == [name for name, single in zip(names, singles) if not single['found']]
+    worst = max(found, key=lambda single: single['toxicity_index'])
+    assert summary['max_toxicity_index'] == worst['toxicity_index']
+    assert summary['max_toxicity_medicine'] == worst['medicine_name']
+    assert summary['total_side_effect_score'] == pytest.approx(sum(single['side_effect_score'] for single in found), abs=1e-3)
+    assert summary['total_interaction_count'] == sum(single['interaction_count'] for single in found)
+    banned = {single['medicine_name'] for single in found if single['label'] == 'banned'}
+    assert sorted(summary['banned']) == sorted(banned)
+    assert summary['banned_any'] == bool(banned)
+    occurrences = Counter(single['medicine_name'] for single in found)
+    assert sorted(summary['duplicates']) == sorted(name for name, count in occurrences.items() if count > 1)
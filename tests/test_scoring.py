@@ -0,0 +1,145 @@
+"""CandidateScorer against the per-item scoring loop it replaced"""
+import random
+import re
+import numpy as np
+
+from medicine_scoring import CandidateScorer, clean_medicine_name, is_valid_text, SKIP_PATTERNS, MEDICINE_KEYWORDS
+
+
+# --------------------
+# Reference: the original MediScanExtractor methods
+# --------------------
+
+def reference_is_valid_text(text):
+    if not text or len(text.strip()) < 2:
+        return False
+    if not re.search(r'[A-Za-z]', text):
+        return False
+    alphanumeric = sum(c.isalnum() for c in text)
+    total = len(text.replace(' ', ''))
+    if total == 0:
+        return False
+    return alphanumeric / total >= 0.7
+
+
+def reference_clean_medicine_name(text):
+    cleaned = re.sub(r'[^\w\s\-/+()]', ' ', text)
+    cleaned = ' '.join(cleaned.split())
+    cleaned = re.sub(r'^\d+\s+', '', cleaned)
+    cleaned = re.sub(r'\s+\d+$', '', cleaned)
+    return cleaned.strip()
+
+
+def reference_identify_medicine_name(extracted_data):
+    candidates = []
+    for idx, item in enumerate(extracted_data[:25]):
+        text = item['text'].strip()
+        text_upper = text.upper()
+        confidence = item['confidence']
+        position_score = 1.0 - (idx * 0.02)
+        area = item.get('area', 0)
+
+        if len(text) < 3:
+            continue
+        if re.match(r'^\d+$', text):
+            continue
+        if any(re.search(pattern, text_upper) for pattern in SKIP_PATTERNS):
+            continue
+        if sum(c.isalpha() for c in text) < 3:
+            continue
+
+        score = confidence * 0.35 + position_score * 0.25
+        if area > 0:
+            score += min(0.15, (area / 10000) * 0.05)
+        if idx < 3:
+            score += 0.20
+        if (text.istitle() or text.isupper()) and 5 <= len(text) <= 30:
+            score += 0.15
+        if re.search(r'[A-Za-z]{4,}', text) and re.search(r'\d+', text):
+            score += 0.20
+        if re.search(r'[A-Za-z]+-\d+', text):
+            score += 0.15
+        if 5 <= len(text) <= 25:
+            score += 0.10
+        if item.get('strategy') in ['original', 'deskewed'] and confidence > 0.75:
+            score += 0.15
+        if any(keyword in text_upper for keyword in MEDICINE_KEYWORDS):
+            score += 0.05
+        if len(text) > 40:
+            score -= 0.20
+        special_count = sum(not c.isalnum() and not c.isspace() for c in text)
+        if special_count > len(text) * 0.3:
+            score -= 0.15
+        if re.match(r'^\d', text):
+            score -= 0.10
+
+        cleaned_name = reference_clean_medicine_name(text)
+        if not cleaned_name or len(cleaned_name) < 3:
+            continue
+
+        candidates.append({
+            'name': cleaned_name,
+            'original_text': text,
+            'confidence': round(confidence * 100, 2),
+            'score': round(score, 3),
+            'position': idx + 1,
+            'strategy': item.get('strategy', 'unknown'),
+            'area': round(area, 2)
+        })
+
+    candidates.sort(key=lambda x: x['score'], reverse=True)
+    return [c for c in candidates if c['score'] > 0.40]
+
+
+# --------------------
+# Randomized inputs
+# --------------------
+
+TEXTS = [
+    'Crocin-650', 'CROCIN', 'Paracetamol Tablets IP', 'MRP: 45.00', 'MRP : 45', 'BATCH NO E12/3', '10 TABLETS ',
+    '10 TABLETS', 'Sun Pharmaceuticals', 'SUN PHARMA', 'pharma', 'IP 500', '10 x 10', 'E12/345', '772/22226123',
+    'R38/38628227', '12', 'ab', 'A-1', 'Dolo 650', '650 Dolo', '@@##Crocin!!', 'Azithromycin 500 mg', 'Strip of 10',
+    'Each film coated tablet contains Paracetamol IP 650 mg and more words', 'Net Qty 10ml', 'x1y2z3',
+    'Ibuprofen Sodium', 'Levo-Cetirizine', '5 ML', 'Syrup', 'MG', '  spaced  text ', 'Título', 'ÄBCDE-12',
+]
+
+
+def random_item(rng):
+    text = rng.choice(TEXTS)
+    if rng.random() < 0.3:
+        text = ''.join(rng.choice('ABCDEFGHabcdefg0123456789 -/:@.') for _ in range(rng.randint(1, 45)))
+    confidence = rng.random()
+    if rng.random() < 0.5:
+        confidence = np.float64(confidence)
+    area = rng.choice([0, rng.randint(1, 400000), np.int64(rng.randint(1, 40000))])
+    strategy = rng.choice(['original', 'deskewed', 'otsu', 'bilateral', None])
+    return {'text': text, 'confidence': confidence, 'area': area, 'strategy': strategy}
+
+
+def random_batches(count=3000, seed=1):
+    rng = random.Random(seed)
+    return [[random_item(rng) for _ in range(rng.randint(0, 40))] for _ in range(count)]
+
+
+def without_bbox(candidates):
+    # Candidates carry their box since the IoU merge; the reference predates it
+    return [{key: value for key, value in c.items() if key != 'bbox'} for c in candidates]
+
+
+def test_score_matches_reference():
+    scorer = CandidateScorer()
+    for extracted_data in random_batches():
+        assert without_bbox(scorer.score(extracted_data)) == reference_identify_medicine_name(extracted_data)
+
+
+def test_score_batch_matches_per_image_scores():
+    scorer = CandidateScorer()
+    batches = random_batches(count=300, seed=2)
+    assert scorer.score_batch(batches) == [scorer.score(extracted_data) for extracted_data in batches]
+
+
+def test_text_helpers_match_reference():
+    for extracted_data in random_batches(count=300, seed=3):
+        for item in extracted_data:
+            assert is_valid_text(item['text']) == reference_is_valid_text(item['text'])
+            assert clean_medicine_name(item['text']) == reference_clean_medicine_name(item['text'])
@@ -0,0 +1,111 @@
+"""VariantSource against the eager preprocessing it replaced"""
+import threading
+import cv2
+import numpy as np
+import pytest
+
+from bench.synthetic import render_pack
+from medicine_extractor import MediScanExtractor
+
+
+def reference_variants(working_img):
+    """The grayscale variants as the original preprocess_image rendered them"""
+    lab = cv2.cvtColor(working_img, cv2.COLOR_BGR2LAB)
+    l, a, b = cv2.split(lab)
+    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8,8))
+    cl = clahe.apply(l)
+    enhanced = cv2.merge([cl, a, b])
+    enhanced_bgr = cv2.cvtColor(enhanced, cv2.COLOR_LAB2BGR)
+    lab_enhanced = cv2.cvtColor(enhanced_bgr, cv2.COLOR_BGR2GRAY)
+
+    gray = cv2.cvtColor(working_img, cv2.COLOR_BGR2GRAY)
+    bilateral = cv2.bilateralFilter(gray, 9, 75, 75)
+    _, otsu = cv2.threshold(bilateral, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    _, otsu_inverted = cv2.threshold(bilateral, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (2,2))
+    morphological = cv2.morphologyEx(otsu, cv2.MORPH_CLOSE, kernel)
+    return {
+        'lab_enhanced': lab_enhanced,
+        'bilateral': bilateral,
+        'otsu': otsu,
+        'otsu_inverted': otsu_inverted,
+        'morphological': morphological,
+    }
+
+
+def images():
+    rng = np.random.default_rng(7)
+    return [render_pack(name, rng, width=width, height=height)[0]
+            for name, width, height in [('Crocin 650', 640, 420), ('Azithral-500', 900, 600), ('Dolo', 333, 517)]]
+
+
+def expected(source):
+    variants = reference_variants(source.working_img)
+    for strategy in source.FRAME_VARIANTS:
+        if strategy in source.frames:
+            variants[strategy] = source.frames[strategy][0]
+    return variants
+
+
+@pytest.mark.parametrize('roi', [False, True])
+def test_preprocess_image_matches_reference(roi):
+    extractor = MediScanExtractor(lazy=True, roi=roi)
+    for img in images():
+        source = extractor.prepare_variants(img)
+        reference = expected(source)
+        source.close()
+        variants = extractor.preprocess_image(img)
+        assert [strategy for strategy, _ in variants] == source.strategies
+        for strategy, image in variants:
+            assert np.array_equal(image, reference[strategy]), strategy
+
+
+@pytest.mark.parametrize('order', ['forward', 'reversed', 'interleaved'])
+def test_reused_buffers_match_reference(order):
+    extractor = MediScanExtractor(lazy=True)
+    for img in images():
+        source = extractor.prepare_variants(img)
+        reference = expected(source)
+        strategies = list(source.strategies)
+        if order == 'reversed':
+            strategies.reverse()
+        elif order == 'interleaved':
+            strategies = strategies[1::2] + strategies[::2]
+
+        held = []
+        for i, strategy in enumerate(strategies):
+            image = source.take(strategy)
+            assert np.array_equal(image, reference[strategy]), strategy
+            held.append((strategy, image))
+            # Release every other variant so later ones render into recycled buffers
+            if i % 2:
+                for held_strategy, held_image in held:
+                    assert np.array_equal(held_image, reference[held_strategy]), held_strategy
+                    source.release(held_strategy, held_image)
+                held = []
+        source.close()
+        assert source.peak_bytes > 0
+
+
+def test_concurrent_takes_match_reference():
+    extractor = MediScanExtractor(lazy=True)
+    for img in images():
+        source = extractor.prepare_variants(img)
+        reference = expected(source)
+        mismatches = []
+
+        def worker(strategies):
+            for _ in range(3):
+                for strategy in strategies:
+                    image = source.take(strategy)
+                    if not np.array_equal(image, reference[strategy]):
+                        mismatches.append(strategy)
+                    source.release(strategy, image)
+
+        threads = [threading.Thread(target=worker, args=(source.strategies[i::3],)) for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        source.close()
+        assert mismatches == []